@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import duo3
+import duo3.history
+import duo3.sentence
+from duo3.history import CsvStorage, History, Tracker
+from duo3.sentence import Attempt, Sentences
+
+WORDS = (
+    "we must respect the will of the individual take it easy I can assure you "
+    "that everything is under control it is important to keep in mind"
+).split()
+JAPANESE = "私たちは個人の意思を尊重しなければならない。"
+
+
+def corpus(path: str, size: int, per_section: int = 12, seed: int = 0):
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf8") as file:
+        writer = csv.writer(file, lineterminator="\n")
+        for no in range(1, size + 1):
+            words = rng.choices(WORDS, k=rng.randint(5, 16))
+            english = " ".join(words).capitalize() + "."
+            writer.writerow((1 + (no - 1) // per_section, no, english, JAPANESE))
+
+
+def history(sentences: Sentences, attempts: int, seed: int = 0) -> History:
+    rng = random.Random(seed)
+    h = History(storage=duo3.history.Storage())
+    for no in sentences.no_array:
+        for _ in range(attempts):
+            h.append(no, rng.choice((0, 0, 0, 1, 2, 4)))
+    return h
+
+
+def measure(func: Callable[[], object], repeat: int) -> dict[str, float]:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return {"min": min(times), "median": statistics.median(times), "repeat": repeat}
+
+
+def typing(sentences: Sentences, limit: int):
+    for k in range(min(limit, len(sentences))):
+        attempt = Attempt(sentences[k])
+        english = attempt.english
+        while not attempt.is_finished():
+            attempt.input("#")
+            attempt.input(english[attempt.cursor].lower())
+            attempt.prompt()
+            attempt.deduction
+
+
+def refresh(sentences: Sentences, h: History):
+    tracker = Tracker(h, zip(sentences.no_array, sentences.section_array))
+    try:
+        colors = {s: tracker.count(s) == 0 for s in sentences.sections}
+        for section in sentences.sections[:5]:
+            [h.is_wrong(no) for no in sentences.noiter(section)]
+        return colors
+    finally:
+        h.listeners.remove(tracker.update)
+
+
+def run(size: int, source: str | None, attempts: int, repeat: int, directory: str):
+    path = source or os.path.join(directory, f"text-{size}.csv")
+    if source is None:
+        corpus(path, size)
+    sentences = duo3.sentence.read(path)
+    sections = sentences.sections
+    h = history(sentences, attempts)
+    history_path = os.path.join(directory, f"history-{size}.csv")
+    storage = CsvStorage(history_path)
+    h.storage = storage
+    h.save()
+    rng = random.Random(0)
+    picks = [rng.sample(sections, min(3, len(sections))) for _ in range(100)]
+    nos = list(sentences.no_array)
+
+    cases: dict[str, Callable[[], object]] = {
+        "sentence.read": lambda: duo3.sentence.read(path),
+        "Sentences.sample": lambda: [sentences.sample(p) for p in picks],
+        "Sentences.sample(is_wrong)": lambda: [
+            sentences.sample(p, predicate=h.is_wrong) for p in picks
+        ],
+        "Attempt.replay": lambda: typing(sentences, 1000),
+        "History.read": storage.load,
+        "History.save": h.save,
+        "History.is_wrong": lambda: [h.is_wrong(no) for no in nos],
+        "selector.refresh": lambda: refresh(sentences, h),
+    }
+    return {name: measure(func, repeat) for name, func in cases.items()}
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    failures = []
+    for corpus_name, cases in results["results"].items():
+        for name, result in cases.items():
+            try:
+                before = baseline["results"][corpus_name][name]["median"]
+            except KeyError:
+                continue
+            if result["median"] > before * (1 + threshold):
+                ratio = result["median"] / before
+                failures.append(f"{corpus_name} {name}: {ratio:.2f}x slower")
+    return failures
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark duo3 hot paths.")
+    parser.add_argument("--sizes", default="560,10000,100000")
+    parser.add_argument("--attempts", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="write JSON results to this file")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    results: dict = {
+        "meta": {
+            "version": duo3.__version__,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": {},
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        for size in map(int, args.sizes.split(",")):
+            bundled = size == 560 and os.path.exists(duo3.sentence.PATH)
+            name = "bundled" if bundled else f"synthetic-{size}"
+            source = duo3.sentence.PATH if bundled else None
+            print(f"{name}...", file=sys.stderr)
+            result = run(size, source, args.attempts, args.repeat, directory)
+            results["results"][name] = result
+            for case, r in result.items():
+                print(f"  {case:28s} {r['median'] * 1000:10.3f} ms", file=sys.stderr)
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf8") as file:
+            file.write(text)
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf8") as file:
+            failures = compare(results, json.load(file), args.threshold)
+        for failure in failures:
+            print(f"REGRESSION {failure}", file=sys.stderr)
+        return 1 if failures else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
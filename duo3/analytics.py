@@ -0,0 +1,236 @@
+from __future__ import annotations
+
+import re
+from collections.abc import Iterable
+
+import numpy as np
+
+import duo3.errorlog
+from duo3.errorlog import TAB
+from duo3.sentence import Sentence, Sentences
+
+WORD = re.compile(r"[A-Za-z]+(?:'[A-Za-z]+)*")
+LIMIT = 20
+
+INDEX = np.dtype(
+    [
+        ("no", "<u4"),
+        ("time", "<f8"),
+        ("length", "<u2"),
+        ("count", "<u2"),
+        ("offset", "<u8"),
+        ("start", "<u8"),
+    ]
+)
+MISTAKE = np.dtype([("position", "<u2"), ("key", "u1")])
+
+
+def ranges(starts: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    offsets = np.cumsum(lengths) - lengths
+    return np.repeat(starts - offsets, lengths) + np.arange(lengths.sum())
+
+
+def fromfile(path: str, dtype: np.dtype) -> np.ndarray:
+    try:
+        with open(path, "rb") as file:
+            data = file.read()
+    except FileNotFoundError:
+        return np.zeros(0, dtype)
+    return np.frombuffer(data[: len(data) - len(data) % dtype.itemsize], dtype)
+
+
+class Log:
+    def __init__(self, index: np.ndarray, states: np.ndarray, mistakes: np.ndarray):
+        offsets = index["offset"].astype(np.int64)
+        lengths = index["length"].astype(np.int64)
+        starts = index["start"].astype(np.int64)
+        counts = index["count"].astype(np.int64)
+        complete = (offsets + lengths <= len(states)) & (
+            starts + counts <= len(mistakes)
+        )
+        n = len(index) if complete.all() else int(np.argmin(complete))
+        self.nos = index["no"][:n].astype(np.int64)
+        self.times = index["time"][:n]
+        self.lengths = lengths[:n]
+        self.offsets = offsets[:n]
+        self.states = states.view(np.int8)
+        selected = mistakes[ranges(starts[:n], counts[:n])]
+        self.mistake_attempts = np.repeat(np.arange(n), counts[:n])
+        self.mistake_positions = selected["position"].astype(np.int64)
+        self.mistake_keys = selected["key"]
+
+    def __len__(self) -> int:
+        return len(self.nos)
+
+    def owner(self, slots: np.ndarray) -> np.ndarray:
+        return np.searchsorted(self.offsets, slots, "right") - 1
+
+
+def load(path: str | None = None) -> Log:
+    index, state, mistakes = duo3.errorlog.paths(path)
+    return Log(
+        fromfile(index, INDEX),
+        fromfile(state, np.dtype(np.uint8)),
+        fromfile(mistakes, MISTAKE),
+    )
+
+
+class Corpus:
+    def __init__(self, sentences: Sentences):
+        self.sentences = sentences
+        size = max(sentences.no_array, default=0) + 1
+        self.starts = np.zeros(size, dtype=np.int64)
+        self.lengths = np.full(size, -1, dtype=np.int64)
+        self.sections = np.zeros(size, dtype=np.int64)
+        self.words: list[str] = []
+        vocabulary: dict[str, int] = {}
+        occurrences: list[int] = []
+        owners: list[int] = []
+        words: list[int] = []
+        start = 0
+        for sentence in sentences:
+            english = sentence.english
+            self.starts[sentence.no] = start
+            self.lengths[sentence.no] = len(english)
+            self.sections[sentence.no] = sentence.section
+            occurrence = [-1] * len(english)
+            for m in WORD.finditer(english):
+                word = m.group().lower()
+                if (index := vocabulary.get(word)) is None:
+                    index = vocabulary[word] = len(self.words)
+                    self.words.append(word)
+                occurrence[m.start() : m.end()] = [len(words)] * len(word)
+                words.append(index)
+                owners.append(sentence.no)
+            occurrences.extend(occurrence)
+            start += len(english)
+        text = "".join(sentence.english for sentence in sentences)
+        codes = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+        codes = np.where(codes < 128, codes, 0).astype(np.uint8)
+        upper = (codes >= ord("A")) & (codes <= ord("Z"))
+        self.codes = np.where(upper, codes + 32, codes).astype(np.uint8)
+        self.typeable = (self.codes >= ord("a")) & (self.codes <= ord("z"))
+        lengths = [len(sentence.english) for sentence in sentences]
+        self.char_no = np.repeat(np.array(sentences.no_array, dtype=np.int64), lengths)
+        self.occurrence = np.array(occurrences, dtype=np.int64)
+        self.occurrence_word = np.array(words, dtype=np.int64)
+        self.occurrence_no = np.array(owners, dtype=np.int64)
+
+
+class Analytics:
+    def __init__(self, corpus: Corpus, log: Log):
+        self.corpus = corpus
+        self.log = log
+        size = len(corpus.lengths)
+        nos = np.minimum(log.nos, size - 1)
+        self.valid = (log.nos < size) & (corpus.lengths[nos] == log.lengths)
+        self.attempts = np.bincount(log.nos[self.valid], minlength=size)
+
+        ma, mp = log.mistake_attempts, log.mistake_positions
+        ok = self.valid[ma] & (mp < log.lengths[ma])
+        self.mistake_chars = corpus.starts[log.nos[ma[ok]]] + mp[ok]
+        self.mistake_keys = log.mistake_keys[ok]
+
+        end = log.offsets[-1] + log.lengths[-1] if len(log) else 0
+        errors = log.states[:end] > 1
+        errors[log.offsets[ma[ok]] + mp[ok]] = True
+        slots = np.flatnonzero(errors)
+        owner = np.maximum(log.owner(slots), 0)
+        inside = slots < log.offsets[owner] + log.lengths[owner]
+        keep = (slots >= log.offsets[owner]) & inside & self.valid[owner]
+        slots, owner = slots[keep], owner[keep]
+        chars = corpus.starts[log.nos[owner]] + slots - log.offsets[owner]
+        typeable = corpus.typeable[chars]
+        self.error_chars = chars[typeable]
+        self.error_owner = owner[typeable]
+
+    def letter_error_rates(self) -> dict[str, float]:
+        corpus = self.corpus
+        typeable = corpus.typeable
+        letters = corpus.codes[typeable] - ord("a")
+        weights = self.attempts[corpus.char_no[typeable]]
+        totals = np.bincount(letters, weights=weights, minlength=26)
+        errors = np.bincount(corpus.codes[self.error_chars] - ord("a"), minlength=26)
+        return {
+            chr(ord("a") + k): errors[k] / totals[k] for k in np.flatnonzero(totals)
+        }
+
+    def word_statistics(self) -> tuple[np.ndarray, np.ndarray]:
+        corpus = self.corpus
+        size = len(corpus.words)
+        weights = self.attempts[corpus.occurrence_no]
+        totals = np.bincount(corpus.occurrence_word, weights=weights, minlength=size)
+        occurrence = corpus.occurrence[self.error_chars]
+        mask = occurrence >= 0
+        occurrence, owner = occurrence[mask], self.error_owner[mask]
+        new = np.ones(len(occurrence), dtype=bool)
+        new[1:] = (occurrence[1:] != occurrence[:-1]) | (owner[1:] != owner[:-1])
+        failed = corpus.occurrence_word[occurrence[new]]
+        errors = np.bincount(failed, minlength=size)
+        return totals, errors
+
+    def word_error_rates(self, min_count: int = 1) -> dict[str, tuple[float, int]]:
+        totals, errors = self.word_statistics()
+        indices = np.flatnonzero(totals >= max(min_count, 1))
+        rates = errors[indices] / totals[indices]
+        order = indices[np.argsort(-rates, kind="stable")]
+        words = self.corpus.words
+        return {words[k]: (errors[k] / totals[k], int(totals[k])) for k in order}
+
+    def weakest_words(self, n: int = LIMIT, min_count: int = 2) -> list[str]:
+        rates = self.word_error_rates(min_count)
+        return [word for word, (rate, _) in rates.items() if rate > 0][:n]
+
+    def confusion(self) -> np.ndarray:
+        matrix = np.zeros((128, 128), dtype=np.int64)
+        expected = self.corpus.codes[self.mistake_chars]
+        np.add.at(matrix, (expected, self.mistake_keys), 1)
+        return matrix
+
+    def confusions(self, n: int = LIMIT) -> list[tuple[str, str, int]]:
+        matrix = self.confusion()
+        matrix[:, 0] = 0
+        order = np.argsort(-matrix, axis=None, kind="stable")[:n]
+        result = []
+        for expected, key in zip(*np.unravel_index(order, matrix.shape)):
+            if count := int(matrix[expected, key]):
+                typed = "tab" if key == TAB else chr(key)
+                result.append((chr(expected), typed, count))
+        return result
+
+    def sentence_error_rates(self) -> np.ndarray:
+        corpus = self.corpus
+        size = len(corpus.lengths)
+        log = self.log
+        typeable = np.bincount(corpus.char_no, weights=corpus.typeable, minlength=size)
+        errors = np.bincount(self.error_owner, minlength=len(log))
+        nos = np.minimum(log.nos, size - 1)
+        keep = self.valid & (typeable[nos] > 0)
+        rates = errors[keep] / typeable[nos[keep]]
+        counts = np.bincount(nos[keep], minlength=size)
+        totals = np.bincount(nos[keep], weights=rates, minlength=size)
+        return np.divide(totals, counts, out=np.zeros(size), where=counts > 0)
+
+    def hardest(self, section: int, k: int = 10) -> list[tuple[int, float]]:
+        rates = self.sentence_error_rates()
+        nos = np.flatnonzero(self.corpus.sections == section)
+        nos = nos[np.argsort(-rates[nos], kind="stable")][:k]
+        return [(int(no), float(rates[no])) for no in nos if rates[no] > 0]
+
+    def weakest(self, sections: Iterable[int], k: int = LIMIT) -> list[Sentence]:
+        corpus = self.corpus
+        totals, errors = self.word_statistics()
+        rates = np.divide(errors, totals, out=np.zeros(len(totals)), where=totals > 0)
+        scores = np.bincount(
+            corpus.occurrence_no,
+            weights=rates[corpus.occurrence_word],
+            minlength=len(corpus.lengths),
+        )
+        nos = np.flatnonzero(np.isin(corpus.sections, list(sections)) & (scores > 0))
+        nos = nos[np.argsort(-scores[nos], kind="stable")][:k]
+        return [corpus.sentences.get(int(no)) for no in nos]
+
+
+def read(sentences: Sentences | Corpus, path: str | None = None) -> Analytics:
+    corpus = sentences if isinstance(sentences, Corpus) else Corpus(sentences)
+    return Analytics(corpus, load(path))
@@ -1,55 +1,119 @@
 from __future__ import annotations
 
+import os
+from collections.abc import Iterable
+from typing import TYPE_CHECKING
+
 from kivy.app import App
+from kivy.clock import Clock
 from kivy.core.audio import Sound
 from kivy.core.text import DEFAULT_FONT, LabelBase
 from kivy.core.window import Window
 from kivy.properties import ObjectProperty
-from kivy.resources import resource_add_path
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.label import Label
 from kivy.uix.progressbar import ProgressBar
+from kivy.uix.textinput import TextInput
+from kivy.uix.widget import Widget
 
 import duo3.audio
+import duo3.errorlog
+import duo3.executor
 import duo3.history
+import duo3.scheduler
+import duo3.search
 import duo3.sentence
-from duo3.sentence import Sentence
-from duo3.uix import SectionSelector, SentenceSelector
+import duo3.trace
+from duo3.executor import HIGH, Executor, Task
+from duo3.history import Record
+from duo3.scheduler import Scheduler
+from duo3.search import Index
+from duo3.sentence import Attempt, Sentence, Sentences
+from duo3.session import DrillSession, Recorder
+from duo3.uix import (
+    PrerenderedLabel,
+    SectionSelector,
+    SentenceSelector,
+    Updates,
+)
+
+if TYPE_CHECKING:
+    from duo3.analytics import Corpus
+
+FONTS = [
+    r"C:\Windows\Fonts\meiryo.ttc",
+    "/System/Library/Fonts/ヒラギノ角ゴシック W3.ttc",
+    "/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/noto-cjk/NotoSansCJK-Regular.ttc",
+]
+
+
+def read() -> tuple[Sentences, Index]:
+    try:
+        sentences = duo3.sentence.read(progress=duo3.executor.report)
+    except Exception:
+        if not os.path.exists(duo3.sentence.PATH):
+            raise
+        sentences = duo3.sentence.read(duo3.sentence.PATH)
+    return sentences, duo3.search.read(sentences)
 
-resource_add_path(r"C:\\WIndows\\Fonts")
-LabelBase.register(DEFAULT_FONT, "meiryo.ttc")
 
-Window.size = (960, 880)
+def weakest(
+    sentences: Sentences, sections: list[int], corpus: Corpus | None = None
+) -> tuple[list[Sentence], Corpus | None]:
+    try:
+        import duo3.analytics
+    except ImportError:
+        return [], None
+    analytics = duo3.analytics.read(corpus or sentences)
+    return analytics.weakest(sections), analytics.corpus
+
+
+def register_fonts():
+    for path in FONTS:
+        if os.path.exists(path):
+            LabelBase.register(DEFAULT_FONT, path)
+            return
 
 
 class SentenceLayout(BoxLayout):
     step: Label = ObjectProperty(None)
-    section: Label = ObjectProperty(None)
-    no: Label = ObjectProperty(None)
+    section: PrerenderedLabel = ObjectProperty(None)
+    no: PrerenderedLabel = ObjectProperty(None)
     past: Label = ObjectProperty(None)
     previous: Label = ObjectProperty(None)
     bar: ProgressBar = ObjectProperty(None)
     deduction: Label = ObjectProperty(None)
-    japanese: Label = ObjectProperty(None)
+    japanese: PrerenderedLabel = ObjectProperty(None)
     english: Label = ObjectProperty(None)
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        self.sentence: Sentence | None = None
+        self.sentence: Attempt | None = None
+        self.typed = ""
         self.audio: Sound | None = None
+        self.waiting: int | None = None
+        self.updates = Updates(Clock.create_trigger(self.render))
+
+    def set(self, widget: Widget, **values):
+        self.updates.set(widget, **values)
 
-    def start(self, sentences: list[Sentence], current: int, history: list[int]):
-        self.step.text = f"Step {current+1}/{len(sentences)}"
+    def render(self, *args):
+        with duo3.trace.span("layout.render"):
+            self.updates.apply()
+        duo3.trace.since("key", "key-to-render")
+
+    def start(self, sentences: list[Attempt], current: int, record: Record | None):
+        self.set(self.step, text=f"Step {current+1}/{len(sentences)}")
         self.sentence = sentences[current]
-        self.display(self.sentence, history, False)
-        self.bar.max = len(sentences)
-        self.bar.value = current + 1
+        self.typed = ""
+        self.display(self.sentence, record, False)
+        self.set(self.bar, max=len(sentences), value=current + 1)
         self.flush()
 
     def finish(self):
-        self.japanese.text = ""
-        self.english.text = "Finished."
-        self.english.color = "33FF77"
+        self.set(self.japanese, text="")
+        self.set(self.english, text="Finished.", color="33FF77")
 
     def play(self):
         if self.audio:
@@ -57,57 +121,76 @@ class SentenceLayout(BoxLayout):
             self.audio.play()
 
     def unload(self):
+        self.waiting = None
         if self.audio:
-            self.audio.unload()
+            self.audio.stop()
+        self.audio = None
+
+    def load(self, no: int):
+        self.waiting = no
+        duo3.audio.cache.request(no, lambda sound: self.loaded(no, sound))
+
+    def loaded(self, no: int, sound: Sound | None):
+        if self.waiting == no:
+            self.waiting = None
+            self.audio = sound
+            self.play()
+
+    def progress(self, text: str, done: int, total: int):
+        self.set(self.bar, max=max(total, 1), value=done)
+        self.set(self.english, text=f"{text} {done}/{total}", color="EEEEEE")
 
     def flush(self):
-        self.english.text = self.sentence.prompt()
+        self.typed += self.sentence.delta()
+        deduction = self.sentence.deduction
         if self.sentence.is_finished():
-            if self.sentence.deduction == 0:
-                self.english.color = "33FF77"
-            else:
-                self.english.color = self.color()
+            color = "33FF77" if deduction == 0 else self.color(deduction)
+            self.set(self.english, text=self.typed, color=color)
         else:
-            self.english.color = "EEEEEE"
-        self.deduction.text = f"Deduction {self.sentence.deduction}"
-        self.deduction.color = self.color()
+            self.set(self.english, text=self.typed + "_", color="EEEEEE")
+        color = self.color(deduction)
+        self.set(self.deduction, text=f"Deduction {deduction}", color=color)
 
     def color(self, deduction: int | None = None):
         if deduction is None:
             deduction = self.sentence.deduction if self.sentence else 0
         return ["EEEEEE", "DDDD22", "DD8833", "DD3333"][min(deduction, 3)]
 
-    def display(self, sentence: Sentence, history: list[int], english: bool = False):
-        self.section.text = f"Section {sentence.section}"
-        self.no.text = f"No. {sentence.no}"
-        if history:
-            last = history[-1]
-            correct = sum(1 for x in history if x == 0)
-            self.past.text = f"Past {correct}/{len(history)}"
-            self.previous.text = f"Previous {last}"
-            if last == 0:
-                self.previous.color = "33ff77"
-            else:
-                self.previous.color = self.color(last)
+    def display(
+        self,
+        sentence: Sentence | Attempt,
+        record: Record | None,
+        english: bool = False,
+    ):
+        self.set(self.section, text=f"Section {sentence.section}")
+        self.set(self.no, text=f"No. {sentence.no}")
+        if record:
+            last = record.last
+            self.set(self.past, text=f"Past {record.correct}/{record.count}")
+            color = "33ff77" if last == 0 else self.color(last)
+            self.set(self.previous, text=f"Previous {last}", color=color)
         else:
-            self.past.text = "Past 0/0"
-            self.previous.text = "Previous -"
-            self.previous.color = self.color(0)
+            self.set(self.past, text="Past 0/0")
+            self.set(self.previous, text="Previous -", color=self.color(0))
         if english:
-            self.english.text = sentence.english
-            self.english.color = "EEEEEE"
-        self.japanese.text = sentence.japanese
-        self.audio = duo3.audio.read(sentence.no)
-        self.play()
+            self.set(self.english, text=sentence.english, color="EEEEEE")
+        self.set(self.japanese, text=sentence.japanese)
+        self.unload()
+        self.load(sentence.no)
+
+    def prerender(self, sentence: Sentence | Attempt):
+        self.section.prerender(f"Section {sentence.section}")
+        self.no.prerender(f"No. {sentence.no}")
+        self.japanese.prerender(sentence.japanese)
 
     def clear(self):
-        self.section.text = "Section 0"
-        self.no.text = "No. 0"
-        self.past.text = "Past 0/0"
-        self.previous.text = "Previous -"
-        self.previous.color = self.color(0)
-        self.english.text = ""
-        self.japanese.text = ""
+        self.set(self.section, text="Section 0")
+        self.set(self.no, text="No. 0")
+        self.set(self.past, text="Past 0/0")
+        self.set(self.previous, text="Previous -", color=self.color(0))
+        self.set(self.english, text="")
+        self.set(self.japanese, text="")
+        self.set(self.bar, value=0)
         self.unload()
 
 
@@ -115,20 +198,80 @@ class Duo3Widget(BoxLayout):
     section_selector: SectionSelector = ObjectProperty(None)
     sentence_selector: SentenceSelector = ObjectProperty(None)
     sentence_layout: SentenceLayout = ObjectProperty(None)
+    search_input: TextInput = ObjectProperty(None)
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        self.sentences = duo3.sentence.read()
+        self.executor = Executor(deliver=duo3.executor.clock())
+        duo3.audio.cache.executor = self.executor
         self.history = duo3.history.read()
-        self.problems: list[Sentence] = []
-        self.current: int = 0
+        self.writer = duo3.history.Writer(self.history, self.executor)
+        self.errorlog = duo3.errorlog.ErrorLog(executor=self.executor)
+        self.session: DrillSession | None = None
+        self.scheduler: Scheduler | None = None
+        self.index: Index | None = None
+        self.recorder: Recorder | None = None
+        self.loading: Task | None = None
+        self.corpus: Corpus | None = None
+        self.retry_save = Clock.create_trigger(self.save)
+        self.load()
+        self.request_keyboard()
+        self.search_input.bind(focus=self.search_focused)
+
+    def load(self):
+        self.sentence_layout.set(self.sentence_layout.english, text="Loading...")
+        self.loading = self.executor.submit(
+            read,
+            priority=HIGH,
+            name="corpus.read",
+            callback=self.loaded,
+            errback=self.failed,
+            progress=self.progress,
+        )
+
+    def progress(self, done: int, total: int):
+        self.sentence_layout.progress("Fetching sentences", done, total)
+
+    def failed(self, error: BaseException):
+        self.loading = None
+        text = f"Failed to load sentences: {error}\nPress Enter to retry."
+        self.sentence_layout.set(self.sentence_layout.english, text=text)
+
+    def loaded(self, result: tuple[Sentences, Index]):
+        self.loading = None
+        self.sentences, self.index = result
+        columns = list(zip(self.sentences.no_array, self.sentences.section_array))
+        self.history.register(columns)
+        self.tracker = duo3.history.Tracker(self.history, columns)
+        self.scheduler = duo3.scheduler.read(
+            columns, self.history, executor=self.executor
+        )
+        self.sentence_layout.clear()
+        self.session = DrillSession(self.sentences, self.history, self.scheduler)
+        self.session.bind(
+            start=self.start,
+            render=lambda problem: self.sentence_layout.flush(),
+            ng=self.ng,
+            play=self.sentence_layout.play,
+            persist=self.persist,
+            finish=self.finish,
+        )
+        self.session.bind(
+            begin=lambda problems: duo3.trace.snapshot("begin"),
+            finish=lambda problems, aborted: duo3.trace.snapshot("finish"),
+        )
+        if os.environ.get("DUO3_RECORD"):
+            self.recorder = Recorder(self.session)
+        self.section_selector.set_sections(self.sentences.sections)
+        self.section_selector.bind(selected=self.section_changed)
+        self.sentence_selector.bind(selected=self.sentence_changed)
+        self.update_section_selector()
+
+    def request_keyboard(self):
+        if getattr(self, "_keyboard", None):
+            return
         self._keyboard = Window.request_keyboard(self._keyboard_closed, self)
         self._keyboard.bind(on_key_down=self._on_keyboard_down)
-        for button in self.section_selector:
-            button.bind(state=self.section_changed)
-        for button in self.sentence_selector:
-            button.bind(state=self.sentence_changed)
-        self.update_section_selector()
 
     def _keyboard_closed(self):
         self._keyboard.unbind(on_key_down=self._on_keyboard_down)
@@ -136,89 +279,149 @@ class Duo3Widget(BoxLayout):
 
     def _on_keyboard_down(self, keyboard, keycode, text, modifiers):
         key = keycode[1]
-        if key == "escape" and self.problems:
-            self.finish()
-        elif key == "enter":
+        if key == "escape":
+            self.save()
+        if self.session is None:
+            if key == "enter" and self.loading is None:
+                self.load()
+            return True
+        duo3.trace.mark("key")
+        if key == "enter":
             self.sentence_selector.unselect()
             if sections := self.section_selector.sections:
-                self.problems = self.sentences.sample(sections)
-                if ps := [p for p in self.problems if self.history.is_wrong(p.no)]:
-                    self.problems = ps
-                self.current = 0
-                self.start()
-        elif key == "spacebar":
-            self.sentence_layout.play()
-        elif self.problems:
-            problem = self.problems[self.current]
-            if problem.is_finished():
-                self.sentence_layout.unload()
-                self.current += 1
-                if self.current == len(self.problems):
-                    self.finish()
-                else:
-                    self.start()
-            else:
-                if not problem.input(key) or key == "tab":
-                    duo3.audio.ng.seek(0)
-                    duo3.audio.ng.play()
-                if problem.is_finished():
-                    self.history.append(problem.no, problem.deduction)
-                    self.history.save()
-                self.sentence_layout.flush()
+                self.begin(sections, modifiers)
+        else:
+            self.session.key(key)
         return True
 
-    def start(self):
-        problem = self.problems[self.current]
-        history = self.history.get_by_list(problem.no)
-        self.sentence_layout.start(self.problems, self.current, history)
+    def begin(self, sections: list[int], modifiers: list[str]):
+        assert self.session
+        if "ctrl" in modifiers:
+            self.executor.submit(
+                weakest,
+                self.sentences,
+                sections,
+                self.corpus,
+                priority=HIGH,
+                name="analytics.weakest",
+                callback=lambda result: self.drill(sections, *result),
+            )
+        else:
+            self.session.begin(sections, scheduled="shift" in modifiers)
 
-    def finish(self):
+    def start(self, problem: Attempt):
+        session = self.session
+        assert session
+        record = self.history.record(problem.no)
+        self.sentence_layout.start(session.problems, session.current, record)
+        if session.current + 1 < len(session.problems):
+            following = session.problems[session.current + 1]
+            duo3.audio.cache.prefetch(following.no)
+            Clock.schedule_once(lambda dt: self.sentence_layout.prerender(following))
+
+    def search(self, query: str):
+        if self.index and self.session and (sentences := self.index.select(query)):
+            self.sentence_selector.unselect()
+            self.session.start(sentences)
+
+    def search_focused(self, widget, focus: bool):
+        if not focus:
+            Clock.schedule_once(lambda dt: self.request_keyboard())
+
+    def save(self, *args):
+        try:
+            saved = self.writer.flush(0.01)
+        except Exception as e:
+            text = f"Failed to save history: {e}"
+            self.sentence_layout.set(self.sentence_layout.english, text=text)
+            return
+        if not saved:
+            self.retry_save()
+
+    def persist(self, problem: Attempt):
+        self.writer.schedule()
+        self.errorlog.append(problem)
+
+    def drill(
+        self,
+        sections: list[int],
+        sentences: list[Sentence],
+        corpus: Corpus | None = None,
+    ):
+        assert self.session
+        self.corpus = self.corpus or corpus
+        if self.session.problem is None:
+            self.session.start(sentences or self.session.sample(sections))
+
+    def ng(self):
+        duo3.audio.ng.seek(0)
+        duo3.audio.ng.play()
+
+    def finish(self, problems: list[Attempt], aborted: bool):
+        self.sentence_layout.unload()
         self.sentence_layout.finish()
         duo3.audio.finish2.seek(0)
         duo3.audio.finish2.play()
-        self.update_section_selector()
-        if self.problems:
-            self.update_sentence_selector(self.problems[0].section)
-        self.problems.clear()
-
-    def section_changed(self, button, value):
-        if value == "down":
-            self.update_sentence_selector(int(button.text))
-        elif value == "normal":
+        sections, _ = self.tracker.pop()
+        self.update_section_selector(sections)
+        if problems:
+            self.update_sentence_selector(problems[0].section)
+
+    def section_changed(self, selector, section: int | None):
+        if section is None:
             self.sentence_selector.clear()
+        else:
+            self.update_sentence_selector(section)
 
-    def sentence_changed(self, button, value):
-        if value == "down" and button.text:
-            no = int(button.text)
-            history = self.history.get_by_list(no)
-            self.sentence_layout.display(self.sentences[no - 1], history, True)
-        elif value == "normal":
+    def sentence_changed(self, selector, no: int | None):
+        if no is None:
             self.sentence_layout.clear()
+        else:
+            record = self.history.record(no)
+            self.sentence_layout.display(self.sentences.get(no), record, True)
 
-    def update_section_selector(self):
-        for button in self.section_selector:
-            no = int(button.text)
-            count = sum(self.history.is_wrong(i) for i in self.sentences.noiter(no))
-            if count == 0:
-                button.color = "33FF77"
-            else:
-                button.color = "EEEEEE"
+    def update_section_selector(self, sections: Iterable[int] | None = None):
+        if sections is None:
+            sections = self.sentences.sections
+        with duo3.trace.span("selector.sections"):
+            colors = {}
+            for section in sections:
+                if self.tracker.count(section) == 0:
+                    colors[section] = "33FF77"
+                else:
+                    colors[section] = "EEEEEE"
+            self.section_selector.set_colors(colors)
 
     def update_sentence_selector(self, section: int):
-        nos = sorted(self.sentences.noiter(section))
-        cs: list[str] = []
-        for no in nos:
-            if self.history.is_wrong(no):
-                cs.append("EEEEEE")
-            else:
-                cs.append("33FF77")
-        self.sentence_selector.set_sentence_numbers(nos, cs)
+        with duo3.trace.span("selector.sentences"):
+            nos = list(self.sentences.noiter(section))
+            cs: list[str] = []
+            for no in nos:
+                if self.history.is_wrong(no):
+                    cs.append("EEEEEE")
+                else:
+                    cs.append("33FF77")
+            self.sentence_selector.set_sentence_numbers(nos, cs)
 
 
 class Duo3App(App):
     def build(self):
+        register_fonts()
+        Window.size = (960, 880)
         return Duo3Widget()
 
+    def on_stop(self):
+        root = self.root
+        root.sentence_layout.unload()
+        root.writer.close()
+        if root.scheduler:
+            root.scheduler.close()
+        root.errorlog.close()
+        if root.recorder:
+            root.recorder.close()
+        root.executor.shutdown(cancel=True, timeout=5)
+        duo3.trace.export()
+
 
 def main():
     Duo3App().run()
@@ -1,17 +1,142 @@
+from __future__ import annotations
+
 import os
+import threading
+from collections import OrderedDict
+from collections.abc import Callable
+from functools import lru_cache
 
 from kivy.core.audio import Sound, SoundLoader
 
 import duo3
+import duo3.bank
+import duo3.trace
+from duo3.bank import Bank
+from duo3.executor import HIGH, LOW, Executor
 
 ROOT = os.path.join(os.path.dirname(duo3.__file__), "audio")
 
-ok: Sound = SoundLoader.load(os.path.join(ROOT, "ng.mp3"))
-ng: Sound = SoundLoader.load(os.path.join(ROOT, "ng.mp3"))
-finish1: Sound = SoundLoader.load(os.path.join(ROOT, "finish1.mp3"))
-finish2: Sound = SoundLoader.load(os.path.join(ROOT, "finish2.mp3"))
+EFFECTS = {
+    "ok": "ng.mp3",
+    "ng": "ng.mp3",
+    "finish1": "finish1.mp3",
+    "finish2": "finish2.mp3",
+}
+
+
+def __getattr__(name: str) -> Sound:
+    if name not in EFFECTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    sound = SoundLoader.load(os.path.join(ROOT, EFFECTS[name]))
+    globals()[name] = sound
+    return sound
+
+
+@lru_cache(maxsize=None)
+def bank() -> Bank | None:
+    return duo3.bank.open_bank()
 
 
+@duo3.trace.timed("audio.read")
 def read(no: int) -> Sound:
+    if (b := bank()) and no in b:
+        return SoundLoader.load(b.wav(no))
     path = os.path.join(ROOT, f"DUO_{no:03d}.mp3")
     return SoundLoader.load(path)
+
+
+class Cache:
+    def __init__(self, capacity: int = 24, executor: Executor | None = None):
+        self.capacity = capacity
+        self.executor = executor
+        self.sounds: OrderedDict[int, Sound | None] = OrderedDict()
+        self.loading: dict[int, threading.Event] = {}
+        self.waiters: dict[int, list[Callable[[Sound | None], None]]] = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __contains__(self, no: int) -> bool:
+        return no in self.sounds
+
+    def __len__(self) -> int:
+        return len(self.sounds)
+
+    def get(self, no: int) -> Sound | None:
+        with self.lock:
+            if no in self.sounds:
+                self.sounds.move_to_end(no)
+                self.hits += 1
+                return self.sounds[no]
+            event = self.loading.get(no)
+        if event:
+            event.wait()
+            return self.get(no)
+        with self.lock:
+            self.misses += 1
+        sound = read(no)
+        with self.lock:
+            self.put(no, sound)
+        return sound
+
+    def request(self, no: int, callback: Callable[[Sound | None], None]):
+        with self.lock:
+            if no not in self.sounds:
+                self.waiters.setdefault(no, []).append(callback)
+                if no not in self.loading:
+                    self.misses += 1
+                    self.start(no, HIGH, "audio.read")
+                return
+            self.sounds.move_to_end(no)
+            self.hits += 1
+            sound = self.sounds[no]
+        callback(sound)
+
+    def prefetch(self, no: int):
+        with self.lock:
+            if no not in self.sounds and no not in self.loading:
+                self.start(no, LOW, "audio.prefetch")
+
+    def start(self, no: int, priority: int, name: str):
+        event = self.loading[no] = threading.Event()
+        if self.executor:
+            self.executor.submit(self.load, no, event, priority=priority, name=name)
+        else:
+            thread = threading.Thread(target=self.load, args=(no, event), daemon=True)
+            thread.start()
+
+    def load(self, no: int, event: threading.Event):
+        try:
+            sound = read(no)
+        except Exception:
+            sound = None
+        with self.lock:
+            self.put(no, sound)
+            del self.loading[no]
+            waiters = self.waiters.pop(no, [])
+        event.set()
+        for callback in waiters:
+            if self.executor:
+                self.executor.deliver(lambda callback=callback: callback(sound))
+            else:
+                callback(sound)
+
+    def put(self, no: int, sound: Sound | None):
+        if (replaced := self.sounds.get(no)) and replaced is not sound:
+            replaced.unload()
+        self.sounds[no] = sound
+        self.sounds.move_to_end(no)
+        while len(self.sounds) > self.capacity:
+            _, evicted = self.sounds.popitem(last=False)
+            if evicted:
+                evicted.unload()
+
+    def clear(self):
+        with self.lock:
+            for sound in self.sounds.values():
+                if sound:
+                    sound.unload()
+            self.sounds.clear()
+
+
+cache = Cache()
@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import hashlib
+import math
+import mmap
+import os
+import re
+import struct
+import subprocess
+import sys
+import wave
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+import duo3
+from duo3.common import ROOT, atomic_write
+
+SOURCE = os.path.join(os.path.dirname(duo3.__file__), "audio")
+PATH = os.path.join(ROOT, "audio.bank")
+WAV = os.path.join(ROOT, "wav")
+
+MAGIC = b"DUO3PCM\0"
+VERSION = 1
+RATE = 22050
+HEADER = struct.Struct("<8sIIHHI32s")
+ENTRY = struct.Struct("<IQQ")
+PATTERN = re.compile(r"DUO_(\d{3})\.(mp3|wav)$")
+
+THRESHOLD = 328  # -40 dBFS
+PADDING = RATE // 100  # 10 ms kept around the trimmed clip
+TARGET = 3277  # -20 dBFS RMS
+PEAK = 32112  # -0.2 dBFS
+
+
+def sources(source: str | None = None) -> dict[int, str]:
+    source = source or SOURCE
+    paths = {}
+    if os.path.isdir(source):
+        for name in sorted(os.listdir(source)):
+            if m := PATTERN.match(name):
+                paths[int(m.group(1))] = os.path.join(source, name)
+    return paths
+
+
+def signature(paths: dict[int, str]) -> bytes:
+    h = hashlib.sha256()
+    for no, path in sorted(paths.items()):
+        stat = os.stat(path)
+        h.update(f"{no}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+    return h.digest()
+
+
+def decode(path: str) -> array:
+    if path.endswith(".wav"):
+        with wave.open(path, "rb") as file:
+            assert file.getnchannels() == 1
+            assert file.getsampwidth() == 2
+            assert file.getframerate() == RATE
+            frames = file.readframes(file.getnframes())
+    else:
+        command = ["ffmpeg", "-v", "error", "-i", path]
+        command += ["-f", "s16le", "-ac", "1", "-ar", str(RATE), "-"]
+        frames = subprocess.run(command, capture_output=True, check=True).stdout
+    samples = array("h")
+    samples.frombytes(frames)
+    if sys.byteorder == "big":
+        samples.byteswap()
+    return samples
+
+
+def trim(samples: array) -> array:
+    start = next((k for k, x in enumerate(samples) if abs(x) > THRESHOLD), None)
+    if start is None:
+        return array("h")
+    end = len(samples)
+    while abs(samples[end - 1]) <= THRESHOLD:
+        end -= 1
+    start = max(start - PADDING, 0)
+    end = min(end + PADDING, len(samples))
+    return samples[start:end]
+
+
+def normalize(samples: array) -> array:
+    if not samples:
+        return samples
+    rms = math.sqrt(sum(x * x for x in samples) / len(samples))
+    peak = max(max(samples), -min(samples))
+    gain = min(TARGET / rms, PEAK / peak)
+    return array("h", (round(x * gain) for x in samples))
+
+
+def process(path: str) -> bytes:
+    samples = normalize(trim(decode(path)))
+    if sys.byteorder == "big":
+        samples.byteswap()
+    return samples.tobytes()
+
+
+def build(
+    source: str | None = None, path: str | None = None, workers: int | None = None
+):
+    paths = sources(source)
+    nos = sorted(paths)
+    with ProcessPoolExecutor(workers) as executor:
+        clips = list(executor.map(process, [paths[no] for no in nos]))
+
+    header = HEADER.pack(MAGIC, VERSION, RATE, 1, 2, len(nos), signature(paths))
+    offset = HEADER.size + ENTRY.size * len(nos)
+    index = []
+    for no, clip in zip(nos, clips):
+        index.append(ENTRY.pack(no, offset, len(clip)))
+        offset += len(clip)
+    with atomic_write(path or PATH, "wb") as file:
+        file.write(header)
+        file.writelines(index)
+        file.writelines(clips)
+
+
+class Bank:
+    def __init__(self, path: str | None = None):
+        self.path = path or PATH
+        with open(self.path, "rb") as file:
+            self.mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.mmap)
+        header = HEADER.unpack_from(self.mmap)
+        magic, version, rate, channels, width, count, digest = header
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"Not an audio bank: {self.path}")
+        self.rate = rate
+        self.channels = channels
+        self.width = width
+        self.signature = digest
+        entries = self.view[HEADER.size : HEADER.size + ENTRY.size * count]
+        self.index: dict[int, tuple[int, int]] = {}
+        for no, offset, length in ENTRY.iter_unpack(entries):
+            self.index[no] = (offset, length)
+        entries.release()
+
+    def __contains__(self, no: int) -> bool:
+        return no in self.index
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def clip(self, no: int) -> memoryview:
+        offset, length = self.index[no]
+        return self.view[offset : offset + length]
+
+    def is_stale(self, source: str | None = None) -> bool:
+        return self.signature != signature(sources(source))
+
+    def wav(self, no: int, directory: str | None = None) -> str:
+        directory = directory or WAV
+        path = os.path.join(directory, f"DUO_{no:03d}.wav")
+        mtime = os.path.getmtime(self.path)
+        if os.path.exists(path) and os.path.getmtime(path) >= mtime:
+            return path
+        with atomic_write(path, "wb") as file:
+            with wave.open(file, "wb") as w:
+                w.setnchannels(self.channels)
+                w.setsampwidth(self.width)
+                w.setframerate(self.rate)
+                w.writeframesraw(self.clip(no))
+        return path
+
+    def close(self):
+        self.view.release()
+        self.mmap.close()
+
+
+def open_bank(path: str | None = None, source: str | None = None) -> Bank | None:
+    try:
+        bank = Bank(path)
+    except (OSError, ValueError, struct.error):
+        return None
+    if bank.is_stale(source):
+        bank.close()
+        return None
+    return bank
+
+
+if __name__ == "__main__":
+    build()
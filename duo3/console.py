@@ -0,0 +1,313 @@
+from __future__ import annotations
+
+import argparse
+import curses
+import locale
+import os
+import shutil
+import subprocess
+import textwrap
+import unicodedata
+from typing import Any, Union
+
+import duo3.bank
+import duo3.errorlog
+import duo3.history
+import duo3.scheduler
+import duo3.search
+import duo3.sentence
+from duo3.errorlog import ErrorLog
+from duo3.history import History, Tracker, Writer
+from duo3.scheduler import Scheduler
+from duo3.search import Index
+from duo3.sentence import Attempt, Sentences
+from duo3.session import DrillSession
+
+PLAYERS = [
+    (["afplay"], (".wav", ".mp3")),
+    (["ffplay", "-nodisp", "-autoexit", "-loglevel", "quiet"], (".wav", ".mp3")),
+    (["mpg123", "-q"], (".mp3",)),
+    (["paplay"], (".wav",)),
+    (["aplay", "-q"], (".wav",)),
+]
+
+CHARS = {
+    "\t": "tab",
+    "\x1b": "escape",
+    " ": "spacebar",
+    "\n": "enter",
+    "\r": "enter",
+    "\x7f": "backspace",
+    "\b": "backspace",
+}
+
+KEYS = {
+    curses.KEY_ENTER: "enter",
+    curses.KEY_BACKSPACE: "backspace",
+    curses.KEY_LEFT: "left",
+    curses.KEY_RIGHT: "right",
+    curses.KEY_UP: "up",
+    curses.KEY_DOWN: "down",
+}
+
+HELP = "←/→ section  Enter drill  n due drill  / search  q quit"
+GOOD = 1
+BAD = 2
+
+Key = Union[str, int]
+
+
+def translate(key: Key) -> str:
+    if isinstance(key, str):
+        return CHARS.get(key, key.lower())
+    return KEYS.get(key, "")
+
+
+def width(text: str) -> int:
+    return sum(2 if unicodedata.east_asian_width(c) in "WF" else 1 for c in text)
+
+
+def wrap(text: str, columns: int) -> list[str]:
+    if width(text) == len(text):
+        return textwrap.wrap(text, max(columns, 1)) or [""]
+    lines, line = [], ""
+    for c in text:
+        if width(line + c) > columns:
+            lines.append(line)
+            line = ""
+        line += c
+    return [*lines, line]
+
+
+class Player:
+    def __init__(self):
+        self.bank = duo3.bank.open_bank()
+        self.process: subprocess.Popen | None = None
+
+    def path(self, no: int) -> str:
+        if self.bank and no in self.bank:
+            return self.bank.wav(no)
+        return os.path.join(duo3.bank.SOURCE, f"DUO_{no:03d}.mp3")
+
+    def command(self, path: str) -> list[str] | None:
+        for command, extensions in PLAYERS:
+            if path.endswith(extensions) and shutil.which(command[0]):
+                return [*command, path]
+        return None
+
+    def play(self, no: int):
+        self.stop()
+        if command := self.command(self.path(no)):
+            devnull = subprocess.DEVNULL
+            self.process = subprocess.Popen(
+                command, stdin=devnull, stdout=devnull, stderr=devnull
+            )
+
+    def stop(self):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+        self.process = None
+
+
+class Console:
+    def __init__(
+        self,
+        screen: Any,
+        sentences: Sentences,
+        history: History,
+        scheduler: Scheduler | None = None,
+        index: Index | None = None,
+        errorlog: ErrorLog | None = None,
+        writer: Writer | None = None,
+        player: Player | None = None,
+    ):
+        self.screen = screen
+        self.sentences = sentences
+        self.history = history
+        self.index = index
+        self.errorlog = errorlog
+        self.writer = writer
+        self.player = player
+        columns = list(zip(sentences.no_array, sentences.section_array))
+        self.tracker = Tracker(history, columns)
+        self.session = DrillSession(sentences, history, scheduler)
+        self.session.bind(
+            start=self.start,
+            ng=self.ng,
+            play=self.play,
+            persist=self.persist,
+            finish=self.finish,
+        )
+        self.sections = sentences.sections
+        self.cursor = 0
+        self.message = HELP
+        self.colors = False
+
+    @property
+    def section(self) -> int:
+        return self.sections[self.cursor]
+
+    def run(self):
+        while True:
+            self.draw()
+            if not self.handle(translate(self.screen.get_wch())):
+                break
+
+    def handle(self, key: str) -> bool:
+        if key == "escape" and self.writer:
+            self.writer.flush()
+        if problem := self.session.problem:
+            if key and (key != "enter" or problem.is_finished()):
+                self.session.key(key)
+        elif key == "q":
+            return False
+        elif key in ("left", "up", "right", "down"):
+            step = -1 if key in ("left", "up") else 1
+            self.cursor = (self.cursor + step) % len(self.sections)
+        elif key == "enter":
+            self.session.begin(self.section)
+        elif key == "n" and self.session.scheduler:
+            self.session.begin(self.section, scheduled=True)
+        elif key == "/" and self.index:
+            query = self.prompt("Search: ")
+            if sentences := self.index.select(query):
+                self.session.start(sentences)
+            else:
+                self.message = f"No sentence matches {query!r}"
+        return True
+
+    def prompt(self, text: str) -> str:
+        height, _ = self.screen.getmaxyx()
+        self.put(height - 1, text)
+        curses.echo()
+        try:
+            return self.screen.getstr(height - 1, len(text)).decode()
+        finally:
+            curses.noecho()
+
+    def start(self, problem: Attempt):
+        self.message = ""
+        self.play()
+
+    def ng(self):
+        if not self.player:
+            curses.beep()
+
+    def play(self):
+        if self.player and (problem := self.session.problem):
+            self.player.play(problem.no)
+
+    def persist(self, problem: Attempt):
+        if self.writer:
+            self.writer.schedule()
+        if self.errorlog:
+            self.errorlog.append(problem)
+
+    def finish(self, problems: list[Attempt], aborted: bool):
+        self.tracker.pop()
+        finished = [p for p in problems if p.is_finished()]
+        total = sum(p.deduction for p in finished)
+        self.message = f"Finished {len(finished)}/{len(problems)}: deduction {total}"
+
+    def put(self, y: int, text: str, attr: int = 0, x: int = 0):
+        try:
+            self.screen.addstr(y, x, text, attr)
+        except curses.error:
+            pass
+
+    def color(self, good: bool) -> int:
+        if not self.colors:
+            return 0
+        return curses.color_pair(GOOD if good else BAD)
+
+    def draw(self):
+        self.screen.erase()
+        _, columns = self.screen.getmaxyx()
+        if self.session.problems:
+            self.draw_problem(columns)
+        else:
+            self.draw_sections(columns)
+        self.screen.refresh()
+
+    def draw_sections(self, columns: int):
+        self.put(0, "DUO3 console", curses.A_BOLD)
+        cell = 9
+        per_row = max(columns // cell, 1)
+        for k, section in enumerate(self.sections):
+            y, x = 2 + k // per_row, (k % per_row) * cell
+            wrong = self.tracker.count(section)
+            attr = self.color(wrong == 0)
+            if k == self.cursor:
+                attr |= curses.A_REVERSE
+            self.put(y, f"{section:>2}:{wrong:>3}", attr, x)
+        y = 3 + (len(self.sections) - 1) // per_row
+        self.put(y + 1, self.message)
+
+    def draw_problem(self, columns: int):
+        session = self.session
+        problem = session.problem
+        assert problem
+        record = self.history.record(problem.no)
+        past = f"{record.correct}/{record.count}" if record else "0/0"
+        previous = record.last if record else "-"
+        header = (
+            f"Step {session.current + 1}/{len(session.problems)}  "
+            f"Section {problem.section}  No. {problem.no}  "
+            f"Past {past}  Previous {previous}  Deduction {problem.deduction}"
+        )
+        self.put(0, header, curses.A_BOLD)
+        y = 2
+        for line in wrap(problem.japanese, columns - 1):
+            self.put(y, line)
+            y += 1
+        y += 1
+        finished = problem.is_finished()
+        attr = self.color(problem.deduction == 0) if finished else 0
+        for line in wrap(problem.prompt(), columns - 1):
+            self.put(y, line, attr)
+            y += 1
+        if finished:
+            self.put(y + 1, "Press any key to continue.")
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Type DUO3 sentences in a terminal.")
+    parser.add_argument("--audio", action="store_true", help="play sentence audio")
+    args = parser.parse_args(argv)
+
+    sentences = duo3.sentence.read()
+    history = duo3.history.read()
+    columns = list(zip(sentences.no_array, sentences.section_array))
+    history.register(columns)
+    scheduler = duo3.scheduler.read(columns, history)
+    index = duo3.search.read(sentences)
+    errorlog = duo3.errorlog.ErrorLog()
+    writer = Writer(history)
+    player = Player() if args.audio else None
+
+    def run(screen):
+        curses.curs_set(0)
+        console = Console(
+            screen, sentences, history, scheduler, index, errorlog, writer, player
+        )
+        if curses.has_colors():
+            curses.use_default_colors()
+            curses.init_pair(GOOD, curses.COLOR_GREEN, -1)
+            curses.init_pair(BAD, curses.COLOR_YELLOW, -1)
+            console.colors = True
+        console.run()
+
+    locale.setlocale(locale.LC_ALL, "")
+    os.environ.setdefault("ESCDELAY", "25")
+    try:
+        curses.wrapper(run)
+    finally:
+        if player:
+            player.stop()
+        writer.close()
+        scheduler.close()
+        errorlog.close()
+
+
+if __name__ == "__main__":
+    main()
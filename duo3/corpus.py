@@ -0,0 +1,219 @@
+from __future__ import annotations
+
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from collections.abc import Iterator, Mapping, Sequence
+from typing import Union, overload
+
+import duo3.sentence
+from duo3.common import atomic_write
+from duo3.sentence import Sentence, Sentences
+
+MAGIC = b"DUO3TXT\0"
+VERSION = 2
+HEADER = struct.Struct("<8sIIIQQ")
+ALIGN = 8
+
+Column = Union[array, memoryview]
+
+
+def target(source: str) -> str:
+    return os.path.splitext(source)[0] + ".bin"
+
+
+def stamp(source: str) -> tuple[int, int]:
+    stat = os.stat(source)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def pad(size: int) -> int:
+    return -size % ALIGN
+
+
+def build(source: str | None = None, path: str | None = None):
+    source = source or duo3.sentence.PATH
+    path = path or target(source)
+    size, mtime_ns = stamp(source)
+    rows = sorted(duo3.sentence.load(source), key=lambda row: row[0])
+    sections = array("H", (row[0] for row in rows))
+    nos = array("I", (row[1] for row in rows))
+    lengths = array("I", (len(row[2]) for row in rows))
+    offsets = array("I", [0])
+    blob = bytearray()
+    for _, _, english, japanese in rows:
+        for text in (english, japanese):
+            blob += text.encode("utf8")
+            offsets.append(len(blob))
+    order = array("I", sorted(range(len(nos)), key=nos.__getitem__))
+    sorted_nos = array("I", (nos[k] for k in order))
+    table = array("H")
+    starts = array("I")
+    for k, section in enumerate(sections):
+        if not table or table[-1] != section:
+            table.append(section)
+            starts.append(k)
+    starts.append(len(sections))
+
+    columns = [sections, nos, lengths, offsets, order, sorted_nos, table, starts]
+    header = HEADER.pack(MAGIC, VERSION, len(rows), len(table), size, mtime_ns)
+    with atomic_write(path, "wb") as file:
+        file.write(header + bytes(pad(len(header))))
+        for column in columns:
+            if sys.byteorder == "big":
+                column.byteswap()
+            data = column.tobytes()
+            file.write(data + bytes(pad(len(data))))
+        file.write(blob)
+
+
+class SentenceList(Sequence[Sentence]):
+    def __init__(self, corpus: MappedSentences, capacity: int = 1024):
+        self.corpus = corpus
+        self.capacity = capacity
+        self.cache: OrderedDict[int, Sentence] = OrderedDict()
+
+    def __repr__(self) -> str:
+        return f"<SentenceList of {len(self)} sentences>"
+
+    def __len__(self) -> int:
+        return len(self.corpus.no_array)
+
+    @overload
+    def __getitem__(self, index: int) -> Sentence:
+        ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[Sentence]:
+        ...
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[k] for k in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if (sentence := self.cache.get(index)) is not None:
+            self.cache.move_to_end(index)
+            return sentence
+        sentence = self.corpus.materialize(index)
+        self.cache[index] = sentence
+        if len(self.cache) > self.capacity:
+            self.cache.popitem(last=False)
+        return sentence
+
+    def __iter__(self) -> Iterator[Sentence]:
+        for index in range(len(self)):
+            yield self[index]
+
+
+class Positions(Mapping[int, int]):
+    def __init__(self, corpus: MappedSentences):
+        self.corpus = corpus
+
+    def __getitem__(self, no: int) -> int:
+        sorted_nos = self.corpus.sorted_nos
+        k = bisect_left(sorted_nos, no)
+        if k == len(sorted_nos) or sorted_nos[k] != no:
+            raise KeyError(no)
+        return self.corpus.order[k]
+
+    def __len__(self) -> int:
+        return len(self.corpus.sorted_nos)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.corpus.no_array)
+
+
+class MappedSentences(Sentences):
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as file:
+            self.mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.mmap)
+        self.columns: list[memoryview] = []
+        header = HEADER.unpack_from(self.mmap)
+        magic, version, count, sections, size, mtime_ns = header
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"Not a compiled corpus: {path}")
+        self.source = (size, mtime_ns)
+        self.offset = HEADER.size + pad(HEADER.size)
+        self.section_array = self.column("H", count)
+        self.no_array = self.column("I", count)
+        self.length_array = self.column("I", count)
+        self.offsets = self.column("I", 2 * count + 1)
+        self.order = self.column("I", count)
+        self.sorted_nos = self.column("I", count)
+        table = self.column("H", sections)
+        starts = self.column("I", sections + 1)
+        self.blob = self.view[self.offset :]
+        self.slices = {
+            table[k]: slice(starts[k], starts[k + 1]) for k in range(sections)
+        }
+        self.positions = Positions(self)  # type: ignore
+        self.sentences = SentenceList(self)  # type: ignore
+
+    def column(self, format: str, count: int) -> Column:
+        size = struct.calcsize(format) * count
+        data = self.view[self.offset : self.offset + size]
+        if len(data) != size:
+            data.release()
+            self.close()
+            raise ValueError(f"Truncated compiled corpus: {self.path}")
+        self.offset += size + pad(size)
+        if sys.byteorder == "big":
+            column = array(format)
+            column.frombytes(data)
+            column.byteswap()
+            data.release()
+            return column
+        self.columns.append(data)
+        view = data.cast(format)
+        self.columns.append(view)
+        return view
+
+    def __repr__(self) -> str:
+        return f"MappedSentences({self.path!r}, {len(self)} sentences)"
+
+    def materialize(self, index: int) -> Sentence:
+        offsets = self.offsets
+        start, middle, end = offsets[2 * index : 2 * index + 3]
+        english = str(self.blob[start:middle], "utf8")
+        japanese = str(self.blob[middle:end], "utf8")
+        section, no = self.section_array[index], self.no_array[index]
+        return Sentence(section, no, english, japanese)
+
+    def is_stale(self, source: str) -> bool:
+        return self.source != stamp(source)
+
+    def close(self):
+        for view in reversed(self.columns):
+            view.release()
+        self.columns = []
+        if hasattr(self, "blob"):
+            self.blob.release()
+        self.view.release()
+        self.mmap.close()
+
+
+def read(source: str | None = None, path: str | None = None) -> MappedSentences:
+    source = source or duo3.sentence.PATH
+    path = path or target(source)
+    try:
+        sentences = MappedSentences(path)
+    except (OSError, ValueError, struct.error):
+        pass
+    else:
+        if not sentences.is_stale(source):
+            return sentences
+        sentences.close()
+    build(source, path)
+    return MappedSentences(path)
+
+
+if __name__ == "__main__":
+    build(*sys.argv[1:3])
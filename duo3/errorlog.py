@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import os
+import struct
+import threading
+import time
+from collections.abc import Iterator
+from typing import IO, TYPE_CHECKING, NamedTuple
+
+from duo3.common import ROOT
+from duo3.sentence import Attempt
+
+PATH = os.path.join(ROOT, "attempts")
+
+INDEX = struct.Struct("<IdHHQQ")
+MISTAKE = struct.Struct("<HB")
+TAB = 9
+
+Record = tuple[int, float, bytes, bytes, int]
+
+if TYPE_CHECKING:
+    from duo3.executor import Executor, Task
+
+
+class Entry(NamedTuple):
+    no: int
+    time: float
+    state: bytes
+    mistakes: list[tuple[int, int]]
+
+
+def encode(key: str) -> int:
+    if key == "tab":
+        return TAB
+    if len(key) == 1 and ord(key) < 128:
+        return ord(key)
+    return 0
+
+
+def paths(path: str | None = None) -> tuple[str, str, str]:
+    path = path or PATH
+    names = ["index.bin", "state.bin", "mistakes.bin"]
+    index, state, mistakes = (os.path.join(path, name) for name in names)
+    return index, state, mistakes
+
+
+class ErrorLog:
+    def __init__(self, path: str | None = None, executor: Executor | None = None):
+        self.path = path or PATH
+        self.executor = executor
+        self.files: list[IO[bytes]] = []
+        self.state = 0
+        self.mistakes = 0
+        self.lock = threading.Lock()
+        self.pending: list[Record] = []
+        self.task: Task | None = None
+
+    def open(self):
+        os.makedirs(self.path, exist_ok=True)
+        index, state, mistakes = paths(self.path)
+        self.files = [open(p, "ab") for p in (state, mistakes, index)]
+        states, keys, size = (file.seek(0, os.SEEK_END) for file in self.files)
+        count = size // INDEX.size
+        self.state = self.mistakes = 0
+        with open(index, "rb") as file:
+            while count:
+                file.seek((count - 1) * INDEX.size)
+                _, _, length, n, offset, start = INDEX.unpack(file.read(INDEX.size))
+                if offset + length <= states and (start + n) * MISTAKE.size <= keys:
+                    self.state, self.mistakes = offset + length, start + n
+                    break
+                count -= 1
+        sizes = [self.state, self.mistakes * MISTAKE.size, count * INDEX.size]
+        for file, size in zip(self.files, sizes):
+            file.truncate(size)
+
+    def append(self, attempt: Attempt, now: float | None = None):
+        now = time.time() if now is None else now
+        keys = b"".join(MISTAKE.pack(p, encode(k)) for p, k in attempt.mistakes)
+        state = attempt.state.tobytes()
+        record = (attempt.no, now, state, keys, len(attempt.mistakes))
+        with self.lock:
+            self.pending.append(record)
+            if self.executor and (self.task is None or self.task.done()):
+                self.task = self.executor.submit(self.write, name="errorlog.append")
+        if self.executor is None:
+            self.write()
+
+    def write(self):
+        while True:
+            with self.lock:
+                records, self.pending = self.pending, []
+                if not records:
+                    self.task = None
+                    return
+            if not self.files:
+                self.open()
+            state, mistakes, index = self.files
+            for no, now, data, keys, count in records:
+                state.write(data)
+                mistakes.write(keys)
+                entry = INDEX.pack(no, now, len(data), count, self.state, self.mistakes)
+                index.write(entry)
+                self.state += len(data)
+                self.mistakes += count
+            for file in self.files:
+                file.flush()
+
+    def close(self, timeout: float | None = None):
+        if (task := self.task) and not task.settle(timeout):
+            raise TimeoutError("Error log is still being written")
+        self.write()
+        for file in self.files:
+            file.close()
+        self.files = []
+
+
+def read(path: str | None = None) -> Iterator[Entry]:
+    index, state, mistakes = paths(path)
+    if not os.path.exists(index):
+        return
+    with open(state, "rb") as file:
+        states = file.read()
+    with open(mistakes, "rb") as file:
+        keys = file.read()
+    with open(index, "rb") as file:
+        data = file.read()
+    for no, t, length, count, offset, start in INDEX.iter_unpack(
+        data[: len(data) - len(data) % INDEX.size]
+    ):
+        block = keys[start * MISTAKE.size : (start + count) * MISTAKE.size]
+        if offset + length > len(states) or len(block) < count * MISTAKE.size:
+            return
+        state = states[offset : offset + length]
+        yield Entry(no, t, state, list(MISTAKE.iter_unpack(block)))
@@ -0,0 +1,259 @@
+from __future__ import annotations
+
+import heapq
+import itertools
+import threading
+import time
+from collections.abc import Callable
+from typing import Any
+
+import duo3.trace
+from duo3.trace import Histogram
+
+HIGH = 0
+NORMAL = 10
+LOW = 20
+
+WORKERS = 2
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+Deliver = Callable[[Callable[[], Any]], Any]
+
+local = threading.local()
+
+
+def immediate(fn: Callable[[], Any]):
+    fn()
+
+
+def clock() -> Deliver:
+    from kivy.clock import Clock
+
+    def deliver(fn: Callable[[], Any]):
+        Clock.schedule_once(lambda dt: fn())
+
+    return deliver
+
+
+def current() -> Task | None:
+    return getattr(local, "task", None)
+
+
+def report(*args):
+    if task := current():
+        task.report(*args)
+
+
+def is_cancelled() -> bool:
+    task = current()
+    return task is not None and task.cancelled
+
+
+class Task:
+    def __init__(
+        self,
+        executor: Executor,
+        fn: Callable[..., Any],
+        args: tuple,
+        priority: int,
+        name: str,
+        callback: Callable[[Any], Any] | None,
+        errback: Callable[[BaseException], Any] | None,
+        progress: Callable[..., Any] | None,
+    ):
+        self.executor = executor
+        self.fn = fn
+        self.args = args
+        self.priority = priority
+        self.name = name
+        self.callback = callback
+        self.errback = errback
+        self.progress = progress
+        self.state = PENDING
+        self.cancelled = False
+        self.result: Any = None
+        self.error: BaseException | None = None
+        self.submitted = time.perf_counter()
+        self.event = threading.Event()
+
+    def __repr__(self) -> str:
+        return f"Task({self.name!r}, priority={self.priority}, state={self.state})"
+
+    def cancel(self) -> bool:
+        with self.executor.condition:
+            if self.state in (DONE, FAILED, CANCELLED):
+                return False
+            self.cancelled = True
+            if self.state == PENDING:
+                self.state = CANCELLED
+                self.executor.cancelled(self)
+                self.event.set()
+        return True
+
+    def done(self) -> bool:
+        return self.event.is_set()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        return self.event.wait(timeout)
+
+    def settle(self, timeout: float | None = None) -> bool:
+        if self.wait(timeout):
+            return True
+        with self.executor.condition:
+            if self.state == PENDING:
+                self.cancel()
+            return self.state == CANCELLED
+
+    def report(self, *args):
+        if self.progress and not self.cancelled:
+            progress = self.progress
+            self.executor.deliver(lambda: self.cancelled or progress(*args))
+
+    def run(self):
+        local.task = self
+        try:
+            with duo3.trace.span(f"task.{self.name}"):
+                self.result = self.fn(*self.args)
+            self.state = DONE
+        except BaseException as e:
+            self.error = e
+            self.state = FAILED
+        finally:
+            local.task = None
+        self.event.set()
+        if self.cancelled:
+            return
+        if self.error is None:
+            if self.callback:
+                callback, result = self.callback, self.result
+                self.executor.deliver(lambda: self.cancelled or callback(result))
+        elif self.errback:
+            errback, error = self.errback, self.error
+            self.executor.deliver(lambda: self.cancelled or errback(error))
+
+
+class Metrics:
+    __slots__ = ("durations", "waits", "failed", "cancelled")
+
+    def __init__(self):
+        self.durations = Histogram()
+        self.waits = Histogram()
+        self.failed = 0
+        self.cancelled = 0
+
+    def summary(self) -> dict[str, Any]:
+        return {
+            "duration": self.durations.summary(),
+            "wait": self.waits.summary(),
+            "failed": self.failed,
+            "cancelled": self.cancelled,
+        }
+
+
+class Executor:
+    def __init__(
+        self,
+        workers: int = WORKERS,
+        deliver: Deliver | None = None,
+        name: str = "duo3-executor",
+    ):
+        self.deliver = deliver or immediate
+        self.condition = threading.Condition()
+        self.queue: list[tuple[int, int, Task]] = []
+        self.counter = itertools.count()
+        self.depth = 0
+        self.max_depth = 0
+        self.running = 0
+        self.metrics: dict[str, Metrics] = {}
+        self.closed = False
+        self.threads = [
+            threading.Thread(target=self.work, name=f"{name}-{k}", daemon=True)
+            for k in range(workers)
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def submit(
+        self,
+        fn: Callable[..., Any],
+        *args,
+        priority: int = NORMAL,
+        name: str | None = None,
+        callback: Callable[[Any], Any] | None = None,
+        errback: Callable[[BaseException], Any] | None = None,
+        progress: Callable[..., Any] | None = None,
+    ) -> Task:
+        name = name or getattr(fn, "__qualname__", "task")
+        task = Task(self, fn, args, priority, name, callback, errback, progress)
+        with self.condition:
+            if self.closed:
+                raise RuntimeError("Executor is shut down")
+            heapq.heappush(self.queue, (priority, next(self.counter), task))
+            self.depth += 1
+            self.max_depth = max(self.max_depth, self.depth)
+            self.condition.notify()
+        return task
+
+    def cancelled(self, task: Task):
+        self.depth -= 1
+        self.metric(task.name).cancelled += 1
+
+    def metric(self, name: str) -> Metrics:
+        if (metrics := self.metrics.get(name)) is None:
+            metrics = self.metrics[name] = Metrics()
+        return metrics
+
+    def work(self):
+        while True:
+            with self.condition:
+                while not self.queue and not self.closed:
+                    self.condition.wait()
+                if not self.queue:
+                    return
+                _, _, task = heapq.heappop(self.queue)
+                if task.state == CANCELLED:
+                    continue
+                self.depth -= 1
+                self.running += 1
+                task.state = RUNNING
+            start = time.perf_counter()
+            task.run()
+            end = time.perf_counter()
+            with self.condition:
+                self.running -= 1
+                metrics = self.metric(task.name)
+                metrics.waits.add((start - task.submitted) * 1e6)
+                metrics.durations.add((end - start) * 1e6)
+                metrics.failed += task.state == FAILED
+                self.condition.notify_all()
+
+    def idle(self) -> bool:
+        return self.depth == 0 and self.running == 0
+
+    def join(self, timeout: float | None = None) -> bool:
+        with self.condition:
+            return self.condition.wait_for(self.idle, timeout)
+
+    def stats(self) -> dict[str, Any]:
+        with self.condition:
+            return {
+                "depth": self.depth,
+                "max_depth": self.max_depth,
+                "running": self.running,
+                "tasks": {n: m.summary() for n, m in sorted(self.metrics.items())},
+            }
+
+    def shutdown(self, cancel: bool = False, timeout: float | None = None):
+        with self.condition:
+            self.closed = True
+            pending = [task for _, _, task in self.queue] if cancel else []
+            self.condition.notify_all()
+        for task in pending:
+            task.cancel()
+        for thread in self.threads:
+            thread.join(timeout)
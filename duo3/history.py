@@ -2,54 +2,403 @@ from __future__ import annotations
 
 import csv
 import os
-from dataclasses import dataclass
+import sqlite3
+import threading
+import time
+from array import array
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
 
-from duo3.common import ROOT
+import duo3.trace
+from duo3.common import ROOT, atomic_write
 
 PATH = os.path.join(ROOT, "history.csv")
+DB_PATH = os.path.join(ROOT, "history.db")
+
+DECODE = bytes.maketrans(b"0123456789", bytes(range(10)))
+ENCODE = bytes.maketrans(bytes(range(10)), b"0123456789")
+
+if TYPE_CHECKING:
+    from duo3.executor import Executor, Task
+
+
+class Record:
+    __slots__ = ("data", "count", "correct", "last", "errors")
+
+    WINDOW = 5
+
+    def __init__(self, data: Iterable[int] = ()):
+        self.data = array("B")
+        self.count = 0
+        self.correct = 0
+        self.last = -1
+        self.errors = 0
+        for deduction in data:
+            self.append(deduction)
+
+    @classmethod
+    def from_string(cls, text: str) -> Record:
+        record = cls()
+        record.data.frombytes(text[1:].encode().translate(DECODE))
+        record.count = len(record.data)
+        record.correct = record.data.count(0)
+        if record.count:
+            record.last = record.data[-1]
+        window = record.data[-cls.WINDOW :]
+        record.errors = len(window) - window.count(0)
+        return record
+
+    def __str__(self) -> str:
+        return "D" + self.data.tobytes().translate(ENCODE).decode()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def append(self, deduction: int):
+        self.data.append(deduction)
+        self.count += 1
+        if deduction == 0:
+            self.correct += 1
+        else:
+            self.errors += 1
+        if self.count > self.WINDOW and self.data[-self.WINDOW - 1] != 0:
+            self.errors -= 1
+        self.last = deduction
+
+    @property
+    def error_rate(self) -> float:
+        return self.errors / min(self.count, self.WINDOW) if self.count else 1.0
+
+
+class Storage:
+    def load(self) -> dict[int, Record]:
+        return {}
+
+    def append(self, no: int, deduction: int):
+        pass
+
+    def save(self, history: History):
+        pass
+
+    def register(self, sentences: Iterable[tuple[int, int]]):
+        pass
+
+    def count_wrong(self, section: int) -> int | None:
+        return None
+
+
+class CsvStorage(Storage):
+    def __init__(self, path: str | None = None):
+        self.path = path
+
+    def load(self) -> dict[int, Record]:
+        return load(self.path or PATH)
+
+    def save(self, history: History):
+        save(history, self.path or PATH)
+
+
+class SqliteStorage(Storage):
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS attempt (
+            no INTEGER NOT NULL,
+            time REAL NOT NULL,
+            deduction INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS attempt_no_time ON attempt (no, time);
+        CREATE TABLE IF NOT EXISTS latest (
+            no INTEGER PRIMARY KEY,
+            deduction INTEGER NOT NULL
+        );
+        CREATE TRIGGER IF NOT EXISTS attempt_latest AFTER INSERT ON attempt
+        BEGIN
+            INSERT OR REPLACE INTO latest VALUES (new.no, new.deduction);
+        END;
+        CREATE TABLE IF NOT EXISTS sentence (
+            no INTEGER PRIMARY KEY,
+            section INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS sentence_section ON sentence (section);
+    """
+
+    def __init__(self, path: str | None = None, csv_path: str | None = None):
+        self.path = path or DB_PATH
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(self.SCHEMA)
+        self.pending: list[tuple[int, float, int]] = []
+        self.lock = threading.Lock()
+        self.migrate(csv_path or PATH)
+
+    def migrate(self, path: str):
+        (version,) = self.connection.execute("PRAGMA user_version").fetchone()
+        if version:
+            return
+        rows = []
+        if os.path.exists(path):
+            for no, record in load(path).items():
+                rows.extend((no, k, d) for k, d in enumerate(record.data))
+        with self.connection:
+            self.connection.executemany("INSERT INTO attempt VALUES (?, ?, ?)", rows)
+            self.connection.execute("PRAGMA user_version = 1")
+
+    def load(self) -> dict[int, Record]:
+        records: dict[int, Record] = {}
+        query = "SELECT no, deduction FROM attempt ORDER BY no, time, rowid"
+        for no, deduction in self.connection.execute(query):
+            if (record := records.get(no)) is None:
+                record = records[no] = Record()
+            record.append(deduction)
+        return records
+
+    def append(self, no: int, deduction: int):
+        with self.lock:
+            self.pending.append((no, time.time(), deduction))
+
+    def save(self, history: History):
+        with self.lock:
+            rows, self.pending = self.pending, []
+            if not rows:
+                return
+            with self.connection:
+                self.connection.executemany(
+                    "INSERT INTO attempt VALUES (?, ?, ?)", rows
+                )
+
+    def register(self, sentences: Iterable[tuple[int, int]]):
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO sentence VALUES (?, ?)", sentences
+            )
+
+    def count_wrong(self, section: int) -> int | None:
+        query = """
+            SELECT COUNT(*) FROM sentence LEFT JOIN latest USING (no)
+            WHERE section = ? AND (deduction IS NULL OR deduction != 0)
+        """
+        with self.lock:
+            (count,) = self.connection.execute(query, (section,)).fetchone()
+        return count
+
+    def close(self):
+        self.connection.close()
 
 
 @dataclass
 class History:
-    history: dict[int, str]
+    records: dict[int, Record] = field(default_factory=dict)
+    storage: Storage = field(default_factory=CsvStorage, repr=False)
+    lock: threading.Lock = field(
+        default_factory=threading.Lock, repr=False, compare=False
+    )
+    listeners: list[Callable[[int, bool, bool], None]] = field(
+        default_factory=list, repr=False, compare=False
+    )
 
     def append(self, no: int, deduction: int):
         deduction = min(deduction, 9)
-        self.history[no] = self.history.get(no, "D") + str(deduction)
+        was_wrong = self.is_wrong(no)
+        with self.lock:
+            if (record := self.records.get(no)) is None:
+                record = self.records[no] = Record()
+            record.append(deduction)
+        self.storage.append(no, deduction)
+        is_wrong = deduction != 0
+        for listener in self.listeners:
+            listener(no, was_wrong, is_wrong)
+
+    def snapshot(self) -> list[tuple[int, str]]:
+        with self.lock:
+            return [(no, str(record)) for no, record in self.records.items()]
+
+    def get(self, no: int, default: str | None = None) -> str | None:
+        if record := self.records.get(no):
+            return str(record)
+        else:
+            return default
 
-    def get(self, *args):
-        return self.history.get(*args)
+    def record(self, no: int) -> Record | None:
+        return self.records.get(no)
 
     def get_by_list(self, no: int) -> list[int]:
-        if history := self.get(no):
-            return [int(x) for x in history[1:]]
+        if record := self.records.get(no):
+            return record.data.tolist()
         else:
             return []
 
     def is_wrong(self, no: int) -> bool:
-        if history := self.get_by_list(no):
-            return history[-1] != 0
+        if record := self.records.get(no):
+            return record.last != 0
         else:
             return True
 
+    def register(self, sentences: Iterable[tuple[int, int]]):
+        self.storage.register(sentences)
+
+    def count_wrong(self, section: int, nos: Iterable[int]) -> int:
+        if (count := self.storage.count_wrong(section)) is not None:
+            return count
+        return sum(map(self.is_wrong, nos))
+
     def save(self):
-        save(self.history)
+        with duo3.trace.span("History.save"):
+            self.storage.save(self)
+
 
+def read(engine: str | None = None) -> History:
+    engine = engine or os.environ.get("DUO3_HISTORY", "csv")
+    if engine == "sqlite":
+        storage: Storage = SqliteStorage()
+    elif engine == "csv":
+        storage = CsvStorage()
+    else:
+        raise ValueError(f"Unknown history engine: {engine}")
+    return History(storage.load(), storage)
 
-def read() -> History:
-    history: dict[int, str] = {}
-    if not os.path.exists(PATH):
-        return History(history)
 
-    with open(PATH, "r", encoding="utf8") as file:
+def load(path: str) -> dict[int, Record]:
+    records: dict[int, Record] = {}
+    if not os.path.exists(path):
+        return records
+
+    with open(path, "r", encoding="utf8") as file:
         reader = csv.reader(file)
         for no, data in reader:
-            history[int(no)] = data
-    return History(history)
+            records[int(no)] = Record.from_string(data)
+    return records
 
 
-def save(history: dict[int, str]):
-    with open(PATH, "w", encoding="utf8") as file:
+def save(history: History, path: str | None = None):
+    rows = history.snapshot()
+    with atomic_write(path or PATH) as file:
         writer = csv.writer(file, lineterminator="\n")
-        for line in history.items():
-            writer.writerow(line)
+        writer.writerows(rows)
+
+
+class Tracker:
+    def __init__(self, history: History, sections: Iterable[tuple[int, int]]):
+        self.history = history
+        self.sections = dict(sections)
+        nos: dict[int, list[int]] = {}
+        for no, section in self.sections.items():
+            nos.setdefault(section, []).append(no)
+        self.counts = {s: history.count_wrong(s, ns) for s, ns in nos.items()}
+        self.dirty: set[int] = set()
+        self.changed: set[int] = set()
+        history.listeners.append(self.update)
+
+    def update(self, no: int, was_wrong: bool, is_wrong: bool):
+        if (section := self.sections.get(no)) is None:
+            return
+        self.counts[section] += is_wrong - was_wrong
+        self.dirty.add(section)
+        self.changed.add(no)
+
+    def count(self, section: int) -> int:
+        return self.counts.get(section, 0)
+
+    def pop(self) -> tuple[set[int], set[int]]:
+        dirty, self.dirty = self.dirty, set()
+        changed, self.changed = self.changed, set()
+        return dirty, changed
+
+
+class Writer:
+    def __init__(self, history: History, executor: Executor | None = None):
+        self.history = history
+        self.executor = executor
+        self.condition = threading.Condition()
+        self.pending = False
+        self.writing = False
+        self.closed = False
+        self.error: BaseException | None = None
+        self.writes = 0
+        self.task: Task | None = None
+        self.thread: threading.Thread | None = None
+        if executor is None:
+            self.thread = threading.Thread(
+                target=self.run, name="duo3-history-writer", daemon=True
+            )
+            self.thread.start()
+
+    def schedule(self):
+        with self.condition:
+            self.pending = True
+            self.condition.notify_all()
+            self.submit()
+
+    def submit(self):
+        if self.executor and (self.task is None or self.task.done()):
+            self.task = self.executor.submit(self.write, name="history.save")
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.pending and not self.closed:
+                    self.condition.wait()
+                if not self.pending:
+                    return
+            self.write()
+
+    def write(self):
+        while True:
+            with self.condition:
+                if not self.pending:
+                    self.task = None
+                    return
+                self.pending = False
+                self.writing = True
+            try:
+                self.history.save()
+            except BaseException as e:
+                self.error = e
+            finally:
+                with self.condition:
+                    self.writing = False
+                    self.writes += 1
+                    self.condition.notify_all()
+
+    def flush(self, timeout: float | None = None) -> bool:
+        if self.executor:
+            done = self.drain(timeout)
+        else:
+            with self.condition:
+                done = self.condition.wait_for(
+                    lambda: not (self.pending or self.writing), timeout
+                )
+        if self.error:
+            error, self.error = self.error, None
+            raise error
+        return done
+
+    def drain(self, timeout: float | None = None) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self.condition:
+                if not (self.pending or self.writing):
+                    return True
+                self.submit()
+                task = self.task
+            if deadline is None:
+                remaining = None
+            elif (remaining := deadline - time.monotonic()) <= 0:
+                return False
+            assert task
+            task.wait(remaining)
+
+    def close(self, timeout: float | None = None):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        if self.thread:
+            self.thread.join(timeout)
+        else:
+            if (task := self.task) and not task.settle(timeout):
+                raise TimeoutError("History is still being saved")
+            self.write()
+        if self.error:
+            error, self.error = self.error, None
+            raise error
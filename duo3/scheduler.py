@@ -0,0 +1,236 @@
+from __future__ import annotations
+
+import heapq
+import os
+import threading
+import time
+from collections.abc import Iterable, Iterator
+from typing import IO, TYPE_CHECKING
+
+from duo3.common import ROOT, atomic_write
+from duo3.history import History
+
+PATH = os.path.join(ROOT, "schedule.log")
+
+DAY = 86400
+RELEARN = 600
+EASE = 2.5
+MIN_EASE = 1.3
+PHASE = 0.6180339887
+LIMIT = 20
+
+Entry = tuple[float, float, int]
+
+if TYPE_CHECKING:
+    from duo3.executor import Executor, Task
+
+
+class Item:
+    __slots__ = ("no", "section", "due", "interval", "ease", "reps")
+
+    def __init__(self, no: int, section: int):
+        self.no = no
+        self.section = section
+        self.due = 0.0
+        self.interval = 0.0
+        self.ease = EASE
+        self.reps = 0
+
+    def __repr__(self) -> str:
+        return f"Item({self.no}, due={self.due:.0f}, ease={self.ease:.2f})"
+
+    def entry(self) -> Entry:
+        return (self.due, self.ease, self.no)
+
+    def review(self, deduction: int, now: float):
+        quality = max(5 - deduction, 0)
+        if quality < 3:
+            self.reps = 0
+            self.interval = 0.0
+            self.due = now + RELEARN
+        else:
+            self.reps += 1
+            if self.reps == 1:
+                self.interval = 1.0
+            elif self.reps == 2:
+                self.interval = 6.0
+            else:
+                self.interval = round(self.interval * self.ease)
+            self.due = now + self.interval * DAY
+        miss = 5 - quality
+        self.ease = max(self.ease + 0.1 - miss * (0.08 + miss * 0.02), MIN_EASE)
+
+    def dumps(self) -> str:
+        return f"{self.no},{self.due:.0f},{self.interval:g},{self.ease:.3f},{self.reps}"
+
+
+class Scheduler:
+    def __init__(
+        self,
+        sections: Iterable[tuple[int, int]],
+        path: str | None = None,
+        executor: Executor | None = None,
+    ):
+        self.path = path or PATH
+        self.executor = executor
+        self.items = {no: Item(no, section) for no, section in sections}
+        self.heaps: dict[int, list[Entry]] = {}
+        self.sizes: dict[int, int] = {}
+        self.lines = 0
+        self.torn = False
+        self.file: IO[str] | None = None
+        self.lock = threading.Lock()
+        self.pending: list[str] = []
+        self.rewrite: list[str] | None = None
+        self.task: Task | None = None
+
+    def derive(self, history: History, now: float | None = None):
+        now = time.time() if now is None else now
+        for no, item in self.items.items():
+            for deduction in history.get_by_list(no):
+                item.review(deduction, now)
+            if item.interval:
+                phase = no * PHASE % 1
+                item.due -= item.interval * DAY * phase
+            if history.is_wrong(no):
+                item.due = 0.0
+
+    def load(self) -> bool:
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path, "r", encoding="utf8") as file:
+            for line in file:
+                if not line.endswith("\n"):
+                    self.torn = True
+                    break
+                self.lines += 1
+                try:
+                    no, due, interval, ease, reps = line.split(",")
+                    values = float(due), float(interval), float(ease), int(reps)
+                    item = self.items.get(int(no))
+                except ValueError:
+                    continue
+                if item:
+                    item.due, item.interval, item.ease, item.reps = values
+        return True
+
+    def build(self):
+        self.heaps = {}
+        for item in self.items.values():
+            self.heaps.setdefault(item.section, []).append(item.entry())
+        for section, heap in self.heaps.items():
+            heapq.heapify(heap)
+            self.sizes[section] = len(heap)
+
+    def is_current(self, entry: Entry) -> bool:
+        item = self.items[entry[2]]
+        return item.due == entry[0] and item.ease == entry[1]
+
+    def review(self, no: int, deduction: int, now: float | None = None):
+        if (item := self.items.get(no)) is None:
+            return
+        item.review(deduction, time.time() if now is None else now)
+        heap = self.heaps.setdefault(item.section, [])
+        heapq.heappush(heap, item.entry())
+        if len(heap) > 2 * self.sizes.get(item.section, 1):
+            self.build()
+        self.append(item)
+
+    def entries(self, sections: Iterable[int]) -> Iterator[Entry]:
+        frontier: list[tuple[Entry, int, int]] = []
+        for section in sections:
+            if heap := self.heaps.get(section):
+                frontier.append((heap[0], section, 0))
+        heapq.heapify(frontier)
+        seen: set[int] = set()
+        while frontier:
+            entry, section, index = heapq.heappop(frontier)
+            if entry[2] not in seen and self.is_current(entry):
+                seen.add(entry[2])
+                yield entry
+            heap = self.heaps[section]
+            for child in (2 * index + 1, 2 * index + 2):
+                if child < len(heap):
+                    heapq.heappush(frontier, (heap[child], section, child))
+
+    def due(
+        self, sections: Iterable[int], n: int = LIMIT, now: float | None = None
+    ) -> list[int]:
+        nos = []
+        for due, _, no in self.entries(sections):
+            if len(nos) == n or (now is not None and due > now):
+                break
+            nos.append(no)
+        return nos
+
+    def append(self, item: Item):
+        with self.lock:
+            if self.lines > 4 * len(self.items):
+                self.rewrite = self.dumps()
+                self.pending = []
+                self.lines = len(self.items)
+            else:
+                self.pending.append(item.dumps() + "\n")
+                self.lines += 1
+            if self.executor and (self.task is None or self.task.done()):
+                self.task = self.executor.submit(self.write, name="schedule.save")
+        if self.executor is None:
+            self.write()
+
+    def dumps(self) -> list[str]:
+        return [item.dumps() + "\n" for item in self.items.values()]
+
+    def write(self):
+        while True:
+            with self.lock:
+                rewrite, self.rewrite = self.rewrite, None
+                pending, self.pending = self.pending, []
+                if rewrite is None and not pending:
+                    self.task = None
+                    return
+            if rewrite is not None:
+                self.replace(rewrite)
+            if pending:
+                if self.file is None:
+                    directory = os.path.dirname(os.path.abspath(self.path))
+                    os.makedirs(directory, exist_ok=True)
+                    self.file = open(self.path, "a", encoding="utf8")
+                    if self.torn:
+                        self.file.write("\n")
+                        self.torn = False
+                self.file.writelines(pending)
+                self.file.flush()
+
+    def replace(self, lines: list[str]):
+        if self.file:
+            self.file.close()
+            self.file = None
+        with atomic_write(self.path) as file:
+            file.writelines(lines)
+        self.torn = False
+
+    def compact(self):
+        self.replace(self.dumps())
+        self.lines = len(self.items)
+
+    def close(self, timeout: float | None = None):
+        if (task := self.task) and not task.settle(timeout):
+            raise TimeoutError("Schedule is still being saved")
+        self.write()
+        if self.file:
+            self.file.close()
+            self.file = None
+
+
+def read(
+    sections: Iterable[tuple[int, int]],
+    history: History,
+    path: str | None = None,
+    executor: Executor | None = None,
+) -> Scheduler:
+    scheduler = Scheduler(sections, path, executor)
+    if not scheduler.load():
+        scheduler.derive(history)
+        scheduler.compact()
+    scheduler.build()
+    return scheduler
@@ -0,0 +1,204 @@
+from __future__ import annotations
+
+import os
+import re
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+from collections.abc import Iterable
+
+from duo3.common import atomic_write
+from duo3.sentence import Sentence, Sentences
+
+MAGIC = b"DUO3IDX\0"
+VERSION = 2
+HEADER = struct.Struct("<8sIQQIIII")
+WORD = re.compile(r"[^\W_]+(?:'[^\W_]+)*")
+TERM = re.compile(r'"([^"]*)"|(\S+)')
+JAPANESE = re.compile(
+    "[\u3000-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff00-\uffef]"
+)
+
+
+def words(text: str) -> list[str]:
+    return [word.lower() for word in WORD.findall(text)]
+
+
+def pairs(tokens: list[str]) -> list[str]:
+    return [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+
+def grams(text: str) -> set[str]:
+    chars = [c for c in text if not c.isspace()]
+    bigrams = ("".join(pair) for pair in zip(chars, chars[1:]))
+    return {*chars, *bigrams}
+
+
+def is_japanese(term: str) -> bool:
+    return JAPANESE.search(term) is not None
+
+
+class Index:
+    def __init__(
+        self,
+        sentences: Sentences,
+        terms: list[str],
+        offsets: array,
+        postings: array,
+        word_ids: array,
+    ):
+        self.sentences = sentences
+        self.terms = terms
+        self.offsets = offsets
+        self.postings = postings
+        self.word_ids = word_ids
+        self.words = [terms[k] for k in word_ids]
+
+    @classmethod
+    def build(cls, sentences: Sentences) -> Index:
+        index: dict[str, list[int]] = {}
+        vocabulary: set[str] = set()
+        for k, sentence in enumerate(sentences):
+            tokens = words(sentence.english)
+            vocabulary.update(tokens)
+            terms = {*tokens, *pairs(tokens), *grams(sentence.japanese)}
+            for term in terms:
+                index.setdefault(term, []).append(k)
+        terms = sorted(index)
+        offsets = array("I", [0])
+        postings = array("I")
+        word_ids = array("I")
+        for k, term in enumerate(terms):
+            postings.extend(index[term])
+            offsets.append(len(postings))
+            if term in vocabulary:
+                word_ids.append(k)
+        return cls(sentences, terms, offsets, postings, word_ids)
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def lookup(self, term: str) -> array:
+        k = bisect_left(self.terms, term)
+        if k < len(self.terms) and self.terms[k] == term:
+            return self.postings[self.offsets[k] : self.offsets[k + 1]]
+        return array("I")
+
+    def prefix(self, prefix: str) -> set[int]:
+        start = bisect_left(self.words, prefix)
+        end = len(self.words)
+        if prefix:
+            end = bisect_left(self.words, prefix[:-1] + chr(ord(prefix[-1]) + 1))
+        result: set[int] = set()
+        for k in self.word_ids[start:end]:
+            result.update(self.postings[self.offsets[k] : self.offsets[k + 1]])
+        return result
+
+    def intersect(self, postings: Iterable[Iterable[int]]) -> set[int]:
+        result: set[int] | None = None
+        for items in sorted(postings, key=len):  # type: ignore
+            result = set(items) if result is None else result.intersection(items)
+            if not result:
+                break
+        return result or set()
+
+    def phrase(self, phrase: str) -> set[int]:
+        tokens = words(phrase)
+        terms = pairs(tokens) or tokens
+        candidates = self.intersect(self.lookup(term) for term in terms)
+        if len(tokens) < 3:
+            return candidates
+        n = len(tokens)
+        matches = set()
+        for k in candidates:
+            ws = words(self.sentences[k].english)
+            if any(ws[i : i + n] == tokens for i in range(len(ws) - n + 1)):
+                matches.add(k)
+        return matches
+
+    def japanese(self, text: str) -> set[int]:
+        text = "".join(c for c in text if not c.isspace())
+        if len(text) < 3:
+            return set(self.lookup(text))
+        candidates = self.intersect(self.lookup(g) for g in grams(text) if len(g) == 2)
+        return {k for k in candidates if text in self.sentences[k].japanese}
+
+    def match(self, term: str) -> set[int]:
+        if is_japanese(term):
+            return self.japanese(term)
+        if term.endswith("*") and " " not in term:
+            return self.prefix(term[:-1].lower())
+        return self.phrase(term)
+
+    def search(self, query: str) -> list[int]:
+        terms = [phrase or term for phrase, term in TERM.findall(query)]
+        if not terms:
+            return []
+        result = self.intersect(self.match(term) for term in terms)
+        return [self.sentences.no_array[k] for k in sorted(result)]
+
+    def select(self, query: str) -> list[Sentence]:
+        return [self.sentences.get(no) for no in self.search(query)]
+
+
+def target(sentences: Sentences) -> str | None:
+    if path := getattr(sentences, "path", None):
+        return os.path.splitext(path)[0] + ".idx"
+    return None
+
+
+def stamp(sentences: Sentences) -> tuple[int, int]:
+    return getattr(sentences, "source", (len(sentences), 0))
+
+
+def dump(index: Index, path: str, source: tuple[int, int]):
+    vocabulary = "\n".join(index.terms).encode("utf8")
+    columns = [array("I", c) for c in (index.offsets, index.postings, index.word_ids)]
+    if sys.byteorder == "big":
+        for column in columns:
+            column.byteswap()
+    counts = (len(index.terms), len(index.postings), len(index.word_ids))
+    with atomic_write(path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, *source, *counts, len(vocabulary)))
+        for column in columns:
+            file.write(column.tobytes())
+        file.write(vocabulary)
+
+
+def load(path: str, sentences: Sentences, source: tuple[int, int]) -> Index | None:
+    try:
+        with open(path, "rb") as file:
+            data = file.read()
+        header = HEADER.unpack_from(data)
+    except (OSError, struct.error):
+        return None
+    magic, version, size, mtime_ns, count, length, nwords, nbytes = header
+    if magic != MAGIC or version != VERSION or (size, mtime_ns) != source:
+        return None
+    sizes = (count + 1, length, nwords)
+    if len(data) != HEADER.size + 4 * sum(sizes) + nbytes:
+        return None
+    columns = []
+    start = HEADER.size
+    for n in sizes:
+        column = array("I")
+        column.frombytes(data[start : start + 4 * n])
+        if sys.byteorder == "big":
+            column.byteswap()
+        columns.append(column)
+        start += 4 * n
+    offsets, postings, word_ids = columns
+    terms = data[start:].decode("utf8").split("\n") if count else []
+    return Index(sentences, terms, offsets, postings, word_ids)
+
+
+def read(sentences: Sentences, path: str | None = None) -> Index:
+    path = path or target(sentences)
+    if path is None:
+        return Index.build(sentences)
+    if (index := load(path, sentences, stamp(sentences))) is not None:
+        return index
+    index = Index.build(sentences)
+    dump(index, path, stamp(sentences))
+    return index
@@ -1,85 +1,161 @@
 from __future__ import annotations
 
 import csv
+import hashlib
+import json
 import os
 import random
-from collections.abc import Iterable, Iterator
+from array import array
+from bisect import bisect_right
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
 from dataclasses import dataclass, field
+from itertools import accumulate, groupby
+from operator import itemgetter
+from typing import TYPE_CHECKING
 
-import bs4
-import requests
-
-from duo3.common import ROOT
+from duo3.common import ROOT, atomic_write
 
 URL = "http://hosono.com/duo3.0/section{:02d}.html"
+SECTIONS = range(1, 46)
+WORKERS = 8
+TIMEOUT = 30
 PATH = os.path.join(ROOT, "text.csv")
+CACHE = os.path.join(ROOT, "sections")
 
+Row = tuple[int, int, str, str]
 
-@dataclass
+if TYPE_CHECKING:
+    import requests
+
+
+def is_typeable(char: str) -> bool:
+    return "a" <= char.lower() <= "z"
+
+
+@dataclass(frozen=True)
 class Sentence:
+    __slots__ = ("section", "no", "english", "japanese", "positions")
+
     section: int
     no: int
     english: str
     japanese: str
-    state: list[int] = field(init=False)
-    cursor: int = 0
 
     def __post_init__(self):
-        self.init()
-
-    def init(self):
-        self.state = [0] * len(self.english)
+        english = self.english
+        positions = array("I", (k for k, c in enumerate(english) if is_typeable(c)))
+        object.__setattr__(self, "positions", positions)
+
+
+def penalty(s: int) -> int:
+    if s < 0:
+        return -s
+    elif s > 1:
+        return s - 1
+    return 0
+
+
+class Attempt:
+    __slots__ = (
+        "sentence",
+        "state",
+        "cursor",
+        "index",
+        "deduction",
+        "rendered",
+        "mistakes",
+    )
+
+    def __init__(self, sentence: Sentence):
+        self.sentence = sentence
+        self.state = array("b", bytes(len(sentence.english)))
         self.cursor = 0
-        self.is_finished()
+        self.index = 0
+        self.deduction = 0
+        self.rendered = 0
+        self.mistakes: list[tuple[int, str]] = []
+        self.skip()
+
+    def __repr__(self) -> str:
+        return f"Attempt({self.sentence!r}, cursor={self.cursor})"
+
+    @property
+    def section(self) -> int:
+        return self.sentence.section
+
+    @property
+    def no(self) -> int:
+        return self.sentence.no
+
+    @property
+    def english(self) -> str:
+        return self.sentence.english
+
+    @property
+    def japanese(self) -> str:
+        return self.sentence.japanese
+
+    def skip(self):
+        positions = self.sentence.positions
+        end = positions[self.index] if self.index < len(positions) else len(self.state)
+        for k in range(self.cursor, end):
+            self.state[k] = 1
+        self.cursor = end
 
     def prompt(self) -> str:
-        text = ""
-        for k, s in enumerate(self.state):
-            if s <= 0:
-                text += "_"
-                break
-            else:
-                text += self.english[k]
+        if self.is_finished():
+            return self.english
+        return self.english[: self.cursor] + "_"
+
+    def delta(self) -> str:
+        text = self.english[self.rendered : self.cursor]
+        self.rendered = self.cursor
         return text
 
     def is_finished(self) -> bool:
-        if self.cursor == len(self.state):
-            return True
-        c = self.english[self.cursor].lower()
-        if "a" <= c <= "z":
-            return False
-        self.state[self.cursor] = 1
-        self.cursor += 1
-        return self.is_finished()
+        return self.cursor == len(self.state)
 
     def input(self, key: str) -> bool:
+        s = self.state[self.cursor]
         if key == "tab":
-            self.state[self.cursor] = 5
-            self.cursor += 1
-            return True
+            t = 5
+            self.mistakes.append((self.cursor, key))
         elif self.english[self.cursor].lower() == key:
-            s = self.state[self.cursor]
-            self.state[self.cursor] = 1 if s == 0 else abs(s)
-            self.cursor += 1
-            return True
+            t = 1 if s == 0 else abs(s)
         else:
-            self.state[self.cursor] -= 1
+            t = max(s - 1, -127)
+            self.mistakes.append((self.cursor, key))
+        self.state[self.cursor] = t
+        self.deduction += penalty(t) - penalty(s)
+        if t <= 0:
             return False
-
-    @property
-    def deduction(self) -> int:
-        deduction = 0
-        for s in self.state:
-            if s < 0:
-                deduction += abs(s)
-            elif s > 1:
-                deduction += s - 1
-        return deduction
+        self.cursor += 1
+        self.index += 1
+        self.skip()
+        return True
 
 
 @dataclass
 class Sentences:
     sentences: list[Sentence]
+    section_array: array = field(init=False, repr=False)
+    no_array: array = field(init=False, repr=False)
+    length_array: array = field(init=False, repr=False)
+    slices: dict[int, slice] = field(init=False, repr=False)
+    positions: dict[int, int] = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.sentences = sorted(self.sentences, key=lambda sentence: sentence.section)
+        self.section_array = array("H", (s.section for s in self.sentences))
+        self.no_array = array("I", (s.no for s in self.sentences))
+        self.length_array = array("I", (len(s.english) for s in self.sentences))
+        self.slices = {}
+        for section, group in groupby(enumerate(self.section_array), itemgetter(1)):
+            indices = [k for k, _ in group]
+            self.slices[section] = slice(indices[0], indices[-1] + 1)
+        self.positions = {no: k for k, no in enumerate(self.no_array)}
 
     def __iter__(self):
         yield from self.sentences
@@ -90,37 +166,100 @@ class Sentences:
     def __getitem__(self, index: int) -> Sentence:
         return self.sentences[index]
 
+    @property
+    def sections(self) -> list[int]:
+        return sorted(self.slices)
+
+    def get(self, no: int) -> Sentence:
+        return self.sentences[self.positions[no]]
+
+    def ranges(self, section: int | Iterable[int]) -> list[range]:
+        sections = [section] if isinstance(section, int) else sorted(set(section))
+        ranges = []
+        for section in sections:
+            if s := self.slices.get(section):
+                ranges.append(range(s.start, s.stop))
+        return ranges
+
     def sentenceiter(self, section: int | Iterable[int]) -> Iterator[Sentence]:
-        sections = [section] if isinstance(section, int) else section
-        for sentence in self:
-            if sentence.section in sections:
-                yield sentence
+        for r in self.ranges(section):
+            yield from self.sentences[r.start : r.stop]
 
     def noiter(self, section: int | Iterable[int]) -> Iterator[int]:
-        for sentence in self.sentenceiter(section):
-            yield sentence.no
+        for r in self.ranges(section):
+            yield from self.no_array[r.start : r.stop]
+
+    def select(
+        self, section: int | Iterable[int], predicate: Callable[[int], bool]
+    ) -> list[Sentence]:
+        return [self.get(no) for no in self.noiter(section) if predicate(no)]
 
     def sample(
-        self, section: int | Iterable[int], k: int = 0, shuffle: bool = True
+        self,
+        section: int | Iterable[int],
+        k: int = 0,
+        shuffle: bool = True,
+        predicate: Callable[[int], bool] | None = None,
     ) -> list[Sentence]:
-        sentences = list(self.sentenceiter(section))
-        for sentence in sentences:
-            sentence.init()
-        if k == 0 or k > len(sentences):
-            k = len(sentences)
-        if shuffle:
-            return random.sample(sentences, k)
+        if predicate:
+            sentences = self.select(section, predicate)
+            if k == 0 or k > len(sentences):
+                k = len(sentences)
+            sentences = random.sample(sentences, k) if shuffle else sentences[:k]
         else:
-            return sentences[:k]
-
+            sentences = self._sample(self.ranges(section), k, shuffle)
+        return sentences
+
+    def _sample(self, ranges: list[range], k: int, shuffle: bool) -> list[Sentence]:
+        starts = list(accumulate((len(r) for r in ranges), initial=0))
+        n = starts[-1]
+        if k == 0 or k > n:
+            k = n
+        indices = random.sample(range(n), k) if shuffle else range(k)
+        sentences = []
+        for index in indices:
+            j = bisect_right(starts, index) - 1
+            sentences.append(self.sentences[ranges[j].start + index - starts[j]])
+        return sentences
+
+
+def connect(workers: int = WORKERS) -> requests.Session:
+    import requests
+    import requests.adapters
+
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=workers, pool_maxsize=workers
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def download(
+    section: int, url: str = URL, session: requests.Session | None = None
+) -> str:
+    import requests
 
-def parse(section: int) -> Iterator[str]:
     print(f"Getting text of section {section}")
-    response = requests.get(URL.format(section))
+    get = session.get if session else requests.get
+    response = get(url.format(section), timeout=TIMEOUT)
+    response.raise_for_status()
     response.encoding = response.apparent_encoding
-    soup = bs4.BeautifulSoup(response.text, "html.parser")
-    for tag in soup.select("p")[1:-1]:
-        yield tag.text
+    return response.text
+
+
+def extract(html: str) -> list[str]:
+    import bs4
+
+    soup = bs4.BeautifulSoup(html, "html.parser")
+    return [tag.text for tag in soup.select("p")[1:-1]]
+
+
+def parse(
+    section: int, url: str = URL, session: requests.Session | None = None
+) -> Iterator[str]:
+    yield from extract(download(section, url, session))
 
 
 def split(text: str) -> tuple[int, str, str]:
@@ -130,16 +269,37 @@ def split(text: str) -> tuple[int, str, str]:
     return int(no), splitted[1].strip(), splitted[2].strip()
 
 
-def fetch() -> Iterator[tuple[int, int, str, str]]:
-    index = 1
-    for section in range(1, 46):
-        for text in parse(section):
-            no, english, japanese = split(text)
-            assert no == index
-            english = collect_english(english)
-            japanese = collect_japanese(japanese)
-            yield section, no, english, japanese
-            index += 1
+def convert(section: int, texts: Iterable[str]) -> list[Row]:
+    rows = []
+    for text in texts:
+        no, english, japanese = split(text)
+        english = collect_english(english)
+        japanese = collect_japanese(japanese)
+        rows.append((section, no, english, japanese))
+    return rows
+
+
+def check(rows: Iterable[Row]) -> Iterator[Row]:
+    for index, row in enumerate(rows, 1):
+        assert row[1] == index
+        yield row
+
+
+def fetch(
+    url: str = URL,
+    sections: Iterable[int] = SECTIONS,
+    session: requests.Session | None = None,
+    workers: int = WORKERS,
+) -> Iterator[Row]:
+    sections = list(sections)
+    with nullcontext(session) if session else connect(workers) as session:
+
+        def get(section: int) -> list[Row]:
+            return convert(section, parse(section, url, session))
+
+        with ThreadPoolExecutor(workers) as executor:
+            pages = executor.map(get, sections)
+            yield from check(row for rows in pages for row in rows)
 
 
 def collect_english(text: str) -> str:
@@ -153,24 +313,168 @@ def collect_japanese(text: str) -> str:
     return text
 
 
-def save():
-    with open(PATH, "w", encoding="utf8") as file:
+def digest(path: str) -> str | None:
+    try:
+        with open(path, "rb") as file:
+            return hashlib.sha256(file.read()).hexdigest()
+    except OSError:
+        return None
+
+
+class Cache:
+    def __init__(self, directory: str | None = None):
+        self.directory = directory or CACHE
+        self.path = os.path.join(self.directory, "manifest.json")
+        self.manifest = self.load()
+
+    def load(self) -> dict:
+        try:
+            with open(self.path, "r", encoding="utf8") as file:
+                manifest = json.load(file)
+        except (OSError, ValueError):
+            manifest = {}
+        manifest.setdefault("sections", {})
+        manifest.setdefault("text", None)
+        return manifest
+
+    def dump(self):
+        with atomic_write(self.path) as file:
+            json.dump(self.manifest, file, indent=1)
+
+    def file(self, section: int, ext: str) -> str:
+        return os.path.join(self.directory, f"section{section:02d}.{ext}")
+
+    def entry(self, section: int) -> dict | None:
+        return self.manifest["sections"].get(str(section))
+
+    def is_valid(self, section: int) -> bool:
+        if (entry := self.entry(section)) and entry.get("count"):
+            return digest(self.file(section, "csv")) == entry["rows"]
+        return False
+
+    def restore(self, section: int) -> bool:
+        if self.is_valid(section):
+            return True
+        entry = self.entry(section)
+        path = self.file(section, "html")
+        if entry and entry["html"] and digest(path) == entry["html"]:
+            with open(path, "r", encoding="utf8") as file:
+                html = file.read()
+            try:
+                self.store(section, html)
+            except ValueError:
+                return False
+            return True
+        return False
+
+    def store(self, section: int, html: str | None, rows: list[Row] | None = None):
+        if html is not None:
+            rows = convert(section, extract(html))
+        if not rows:
+            raise ValueError(f"No sentences in section {section}")
+        if html is not None:
+            with atomic_write(self.file(section, "html")) as file:
+                file.write(html)
+        path = self.file(section, "csv")
+        with atomic_write(path) as file:
+            writer = csv.writer(file, lineterminator="\n")
+            writer.writerows(rows)
+        html_digest = None if html is None else digest(self.file(section, "html"))
+        entry = {"html": html_digest, "rows": digest(path), "count": len(rows)}
+        self.manifest["sections"][str(section)] = entry
+        self.dump()
+
+    def rows(self, section: int) -> list[Row]:
+        with open(self.file(section, "csv"), "r", encoding="utf8") as file:
+            return [(int(s), int(no), e, j) for s, no, e, j in csv.reader(file)]
+
+    def adopt(self, path: str, sections: list[int]) -> bool:
+        try:
+            rows = list(check(load(path)))
+        except (OSError, ValueError, AssertionError):
+            return False
+        if sorted({row[0] for row in rows}) != sections:
+            return False
+        for section, group in groupby(rows, itemgetter(0)):
+            self.store(section, None, list(group))
+        return True
+
+    def stamp(self, path: str, sections: list[int]):
+        stat = os.stat(path)
+        text = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+        self.manifest["text"] = dict(text, sections=sections)
+        self.dump()
+
+    def is_complete(self, path: str, sections: list[int]) -> bool:
+        if not (text := self.manifest["text"]) or text["sections"] != sections:
+            return False
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        return (stat.st_size, stat.st_mtime_ns) == (text["size"], text["mtime_ns"])
+
+
+def save(
+    url: str = URL,
+    session: requests.Session | None = None,
+    sections: Iterable[int] = SECTIONS,
+    workers: int = WORKERS,
+    cache: Cache | None = None,
+    progress: Callable[[int, int], None] | None = None,
+):
+    sections = list(sections)
+    cache = cache or Cache()
+    if not cache.manifest["sections"] and os.path.exists(PATH):
+        cache.adopt(PATH, sections)
+
+    missing = [section for section in sections if not cache.restore(section)]
+    done = len(sections) - len(missing)
+    if progress:
+        progress(done, len(sections))
+    if missing:
+        error: Exception | None = None
+        with nullcontext(session) if session else connect(workers) as session:
+            with ThreadPoolExecutor(workers) as executor:
+                futures = {
+                    executor.submit(download, section, url, session): section
+                    for section in missing
+                }
+                for future in as_completed(futures):
+                    try:
+                        cache.store(futures[future], future.result())
+                    except Exception as e:
+                        error = error or e
+                    done += 1
+                    if progress:
+                        progress(done, len(sections))
+        if error:
+            raise error
+
+    rows = check(row for section in sections for row in cache.rows(section))
+    with atomic_write(PATH) as file:
         writer = csv.writer(file, lineterminator="\n")
-        for line in fetch():
-            writer.writerow(line)
+        writer.writerows(rows)
+    cache.stamp(PATH, sections)
+
+
+def load(path: str) -> Iterator[Row]:
+    with open(path, "r", encoding="utf8") as file:
+        for section, no, english, japanese in csv.reader(file):
+            yield int(section), int(no), english, japanese
+
 
+def read(
+    path: str | None = None, progress: Callable[[int, int], None] | None = None
+) -> Sentences:
+    import duo3.corpus
 
-def read() -> Sentences:
-    if not os.path.exists(PATH):
-        save()
+    if path is None:
+        path = PATH
+        if not Cache().is_complete(path, list(SECTIONS)):
+            save(progress=progress)
 
-    sentences = []
-    with open(PATH, "r", encoding="utf8") as file:
-        reader = csv.reader(file)
-        for section, no, english, japnese in reader:
-            sentence = Sentence(int(section), int(no), english, japnese)
-            sentences.append(sentence)
-    return Sentences(sentences)
+    return duo3.corpus.read(path)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,329 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+from typing import Any
+
+import duo3.sentence
+from duo3.common import ROOT
+from duo3.history import CsvStorage, History
+from duo3.sentence import Attempt, Sentences
+from duo3.session import DrillSession, summary
+
+USERS = os.path.join(ROOT, "users")
+HOST = "127.0.0.1"
+PORT = 8765
+INTERVAL = 2.0
+NAME = re.compile(r"[A-Za-z0-9_.-]{1,32}$")
+
+Event = dict[str, Any]
+
+
+class User:
+    def __init__(self, name: str, directory: str):
+        self.name = name
+        storage = CsvStorage(os.path.join(directory, name, "history.csv"))
+        self.history = History(storage.load(), storage)
+        self.dirty = False
+        self.lock = threading.Lock()
+
+    def save(self):
+        with self.lock:
+            self.history.save()
+
+
+class Connection:
+    def __init__(self, server: Server):
+        self.server = server
+        self.user: User | None = None
+        self.session: DrillSession | None = None
+        self.events: list[Event] = []
+
+    def login(self, name: str) -> Event:
+        if not NAME.match(name) or name.startswith("."):
+            raise ValueError(f"Invalid user name: {name!r}")
+        self.user = self.server.user(name)
+        session = DrillSession(self.server.sentences, self.user.history)
+        self.session = session
+        session.bind(
+            start=self.start,
+            render=self.render,
+            ng=lambda: self.events.append({"type": "ng"}),
+            persist=self.persist,
+            finish=self.finish,
+        )
+        return {"type": "user", "name": name}
+
+    def start(self, problem: Attempt):
+        assert self.session
+        self.events.append(
+            {
+                "type": "start",
+                "step": self.session.current + 1,
+                "count": len(self.session.problems),
+                "section": problem.section,
+                "no": problem.no,
+                "japanese": problem.japanese,
+                "prompt": problem.prompt(),
+            }
+        )
+
+    def render(self, problem: Attempt):
+        self.events.append(
+            {
+                "type": "render",
+                "prompt": problem.prompt(),
+                "deduction": problem.deduction,
+                "finished": problem.is_finished(),
+            }
+        )
+
+    def persist(self, problem: Attempt):
+        assert self.user
+        self.user.dirty = True
+
+    def finish(self, problems: list[Attempt], aborted: bool):
+        finished = [p for p in problems if p.is_finished()]
+        deduction = sum(p.deduction for p in finished)
+        event = {"type": "finish", "count": len(finished), "deduction": deduction}
+        self.events.append({**event, "aborted": aborted})
+
+    def dispatch(self, line: str) -> list[Event]:
+        command, _, argument = line.strip().partition(" ")
+        if command == "user":
+            return [self.login(argument)]
+        if self.session is None:
+            raise ValueError("Log in first with 'user <name>'")
+        self.events = []
+        if command == "begin":
+            sections = [int(s) for s in argument.split(",") if s]
+            self.session.begin(sections or self.server.sentences.sections)
+        elif command == "key":
+            self.server.keys += 1
+            self.session.key(argument)
+        elif command == "drill":
+            nos = [int(no) for no in argument.split(",") if no]
+            self.session.start([self.server.sentences.get(no) for no in nos])
+        else:
+            raise ValueError(f"Unknown command: {command!r}")
+        return self.events
+
+
+class Server:
+    def __init__(
+        self,
+        sentences: Sentences,
+        directory: str | None = None,
+        interval: float = INTERVAL,
+    ):
+        self.sentences = sentences
+        self.directory = directory or USERS
+        self.interval = interval
+        self.users: dict[str, User] = {}
+        self.connections = 0
+        self.keys = 0
+        self.saves = 0
+        self.server: asyncio.AbstractServer | None = None
+        self.task: asyncio.Task | None = None
+
+    def user(self, name: str) -> User:
+        if (user := self.users.get(name)) is None:
+            user = self.users[name] = User(name, self.directory)
+        return user
+
+    async def handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ):
+        connection = Connection(self)
+        self.connections += 1
+        try:
+            while line := await reader.readline():
+                if line.strip() == b"quit":
+                    break
+                try:
+                    events = connection.dispatch(line.decode())
+                    reply: dict[str, Any] = {"ok": True, "events": events}
+                except (ValueError, KeyError) as e:
+                    reply = {"ok": False, "error": str(e)}
+                data = json.dumps(reply, ensure_ascii=False).encode()
+                writer.write(data + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.connections -= 1
+            writer.close()
+
+    async def persist(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+    async def flush(self):
+        users = [user for user in self.users.values() if user.dirty]
+        for user in users:
+            user.dirty = False
+        if users:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self.save, users)
+
+    def save(self, users: list[User]):
+        for user in users:
+            user.save()
+            self.saves += 1
+
+    async def start(self, host: str = HOST, port: int = PORT) -> int:
+        self.server = await asyncio.start_server(self.handle, host, port)
+        self.task = asyncio.create_task(self.persist())
+        return self.server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        if self.task:
+            self.task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self.task
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+        await self.flush()
+
+
+async def request(
+    reader: asyncio.StreamReader, writer: asyncio.StreamWriter, line: str
+) -> list[Event]:
+    writer.write(line.encode() + b"\n")
+    await writer.drain()
+    reply = json.loads(await reader.readline())
+    if not reply["ok"]:
+        raise RuntimeError(reply["error"])
+    return reply["events"]
+
+
+async def drill(
+    host: str,
+    port: int,
+    name: str,
+    sentences: Sentences,
+    sessions: int,
+    sections: list[int],
+    error: float,
+    latencies: list[float],
+):
+    reader, writer = await asyncio.open_connection(host, port)
+    rng = random.Random(name)
+    await request(reader, writer, f"user {name}")
+    for _ in range(sessions):
+        section = rng.choice(sections)
+        events = await request(reader, writer, f"begin {section}")
+        while events and events[-1]["type"] != "finish":
+            attempt = Attempt(sentences.get(events[-1]["no"]))
+            while events[-1]["type"] != "finish":
+                if attempt.is_finished():
+                    key = "n"
+                elif rng.random() < error:
+                    key = "#"
+                else:
+                    key = attempt.english[attempt.cursor].lower()
+                start = time.perf_counter()
+                events = await request(reader, writer, f"key {key}")
+                latencies.append(time.perf_counter() - start)
+                if attempt.is_finished():
+                    break
+                attempt.input(key)
+    writer.write(b"quit\n")
+    await writer.drain()
+    writer.close()
+
+
+async def load(
+    host: str | None,
+    port: int,
+    users: int,
+    sessions: int,
+    error: float,
+    sentences: Sentences,
+    directory: str | None = None,
+) -> dict[str, float]:
+    with contextlib.ExitStack() as stack:
+        server = None
+        if host is None:
+            if directory is None:
+                directory = stack.enter_context(tempfile.TemporaryDirectory())
+            server = Server(sentences, directory)
+            host, port = HOST, await server.start(HOST, 0)
+        latencies: list[float] = []
+        sections = sentences.sections
+        clients = [
+            drill(
+                host, port, f"load{k}", sentences, sessions, sections, error, latencies
+            )
+            for k in range(users)
+        ]
+        start = time.perf_counter()
+        try:
+            await asyncio.gather(*clients)
+        finally:
+            elapsed = time.perf_counter() - start
+            if server:
+                await server.close()
+    rate = len(latencies) / elapsed if elapsed else 0.0
+    result = {"users": users, "seconds": elapsed, "keys_per_s": rate}
+    return {**result, **summary(latencies)}
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="DUO3 multi-user drill server.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve = commands.add_parser("serve", help="run the drill server")
+    serve.add_argument("--host", default=HOST)
+    serve.add_argument("--port", type=int, default=PORT)
+    serve.add_argument("--interval", type=float, default=INTERVAL)
+    bench = commands.add_parser("load", help="run the load generator")
+    bench.add_argument("--host", help="server to connect to; omit to start one")
+    bench.add_argument("--port", type=int, default=PORT)
+    bench.add_argument("--users", type=int, default=200)
+    bench.add_argument("--sessions", type=int, default=1)
+    bench.add_argument("--error", type=float, default=0.05)
+    bench.add_argument("--directory", help="history directory for a local server")
+    args = parser.parse_args(argv)
+
+    sentences = duo3.sentence.read()
+    if args.command == "serve":
+
+        async def run():
+            server = Server(sentences, interval=args.interval)
+            port = await server.start(args.host, args.port)
+            print(f"Serving {len(sentences)} sentences on {args.host}:{port}")
+            try:
+                await asyncio.Event().wait()
+            finally:
+                await server.close()
+
+        try:
+            asyncio.run(run())
+        except KeyboardInterrupt:
+            pass
+    else:
+        coroutine = load(
+            args.host,
+            args.port,
+            args.users,
+            args.sessions,
+            args.error,
+            sentences,
+            args.directory,
+        )
+        result = asyncio.run(coroutine)
+        print(" ".join(f"{k}={v:.1f}" for k, v in result.items()))
+
+
+if __name__ == "__main__":
+    main()
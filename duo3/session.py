@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import os
+import sys
+import time
+from collections.abc import Callable, Iterable, Iterator
+from typing import IO, Any
+
+import duo3.sentence
+from duo3.common import ROOT
+from duo3.history import History, Storage
+from duo3.scheduler import Scheduler
+from duo3.sentence import Attempt, Sentence, Sentences
+
+RECORDS = os.path.join(ROOT, "sessions")
+
+EVENTS = ("begin", "key", "start", "render", "ng", "play", "persist", "finish")
+
+
+class DrillSession:
+    def __init__(
+        self,
+        sentences: Sentences,
+        history: History,
+        scheduler: Scheduler | None = None,
+    ):
+        self.sentences = sentences
+        self.history = history
+        self.scheduler = scheduler
+        self.problems: list[Attempt] = []
+        self.current = 0
+        self.callbacks: dict[str, list[Callable[..., Any]]] = {e: [] for e in EVENTS}
+
+    def bind(self, **callbacks: Callable[..., Any]):
+        for name, callback in callbacks.items():
+            if name not in self.callbacks:
+                raise ValueError(f"Unknown event: {name}")
+            self.callbacks[name].append(callback)
+
+    def emit(self, name: str, *args):
+        for callback in self.callbacks[name]:
+            callback(*args)
+
+    @property
+    def problem(self) -> Attempt | None:
+        if self.current < len(self.problems):
+            return self.problems[self.current]
+        return None
+
+    def sample(self, sections: int | Iterable[int]) -> list[Sentence]:
+        sections = [sections] if isinstance(sections, int) else list(sections)
+        problems = self.sentences.sample(sections, predicate=self.history.is_wrong)
+        return problems or self.sentences.sample(sections)
+
+    def schedule(self, sections: int | Iterable[int]) -> list[Sentence]:
+        if self.scheduler is None:
+            raise ValueError("No scheduler is attached to this session")
+        sections = [sections] if isinstance(sections, int) else list(sections)
+        nos = self.scheduler.due(sections, now=time.time())
+        nos = nos or self.scheduler.due(sections)
+        return [self.sentences.get(no) for no in nos]
+
+    def begin(self, sections: int | Iterable[int], scheduled: bool = False):
+        if scheduled:
+            self.start(self.schedule(sections))
+        else:
+            self.start(self.sample(sections))
+
+    def start(self, sentences: Iterable[Sentence]):
+        self.problems = [Attempt(sentence) for sentence in sentences]
+        self.current = 0
+        self.emit("begin", self.problems)
+        if self.problems:
+            self.emit("start", self.problems[0])
+
+    def key(self, key: str):
+        self.emit("key", key)
+        if key == "escape":
+            if self.problems:
+                self.finish(True)
+        elif key == "spacebar":
+            self.emit("play")
+        elif self.problems:
+            problem = self.problems[self.current]
+            if problem.is_finished():
+                self.current += 1
+                if self.current == len(self.problems):
+                    self.finish(False)
+                else:
+                    self.emit("start", self.problems[self.current])
+            else:
+                if not problem.input(key) or key == "tab":
+                    self.emit("ng")
+                if problem.is_finished():
+                    self.history.append(problem.no, problem.deduction)
+                    if self.scheduler:
+                        self.scheduler.review(problem.no, problem.deduction)
+                    self.emit("persist", problem)
+                self.emit("render", problem)
+
+    def finish(self, aborted: bool):
+        problems, self.problems = self.problems, []
+        self.current = 0
+        self.emit("finish", problems, aborted)
+
+
+class Recorder:
+    def __init__(self, session: DrillSession, path: str | None = None):
+        if path is None:
+            name = time.strftime("%Y%m%d-%H%M%S.rec")
+            path = os.path.join(RECORDS, name)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.file: IO[str] = open(path, "w", encoding="utf8")
+        self.time = time.perf_counter()
+        session.bind(begin=self.begin, key=self.key)
+
+    def write(self, text: str):
+        now = time.perf_counter()
+        self.file.write(f"{round((now - self.time) * 1000)} {text}\n")
+        self.time = now
+
+    def begin(self, problems: list[Attempt]):
+        self.write("!begin " + ",".join(str(problem.no) for problem in problems))
+
+    def key(self, key: str):
+        self.write(key)
+
+    def close(self):
+        self.file.close()
+
+
+def entries(path: str) -> Iterator[tuple[int, str]]:
+    with open(path, "r", encoding="utf8") as file:
+        for line in file:
+            dt, text = line.rstrip("\n").split(" ", 1)
+            yield int(dt), text
+
+
+def replay(
+    path: str, session: DrillSession, send: Callable[[str], Any] | None = None
+) -> list[float]:
+    send = send or session.key
+    latencies = []
+    for _, text in entries(path):
+        if text.startswith("!begin"):
+            nos = text[7:].split(",") if text[7:] else []
+            session.start([session.sentences.get(int(no)) for no in nos])
+        else:
+            start = time.perf_counter()
+            send(text)
+            latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def summary(latencies: list[float]) -> dict[str, float]:
+    xs = sorted(latencies)
+    if not xs:
+        return {"keys": 0}
+
+    def percentile(p: float) -> float:
+        return xs[min(int(p * len(xs)), len(xs) - 1)] * 1e6
+
+    return {
+        "keys": len(xs),
+        "mean_us": sum(xs) / len(xs) * 1e6,
+        "p50_us": percentile(0.5),
+        "p99_us": percentile(0.99),
+        "max_us": xs[-1] * 1e6,
+    }
+
+
+def main(paths: list[str]):
+    sentences = duo3.sentence.read()
+    for path in paths:
+        session = DrillSession(sentences, History(storage=Storage()))
+        result = summary(replay(path, session))
+        print(path, " ".join(f"{k}={v:.1f}" for k, v in result.items()))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+from typing import Any, ContextManager, TypeVar
+
+from duo3.common import ROOT, atomic_write
+
+TRACE = os.path.join(ROOT, "trace.json")
+SUMMARY = os.path.join(ROOT, "trace-summary.json")
+
+EVENTS = 100_000
+BASE = 2 ** 0.25  # four buckets per doubling of microseconds
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+class Histogram:
+    __slots__ = ("buckets", "count", "total", "max")
+
+    def __init__(self):
+        self.buckets: dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, us: float):
+        bucket = math.ceil(math.log(us, BASE)) if us > 1 else 0
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.total += us
+        self.max = max(self.max, us)
+
+    def percentile(self, p: float) -> float:
+        rank = p * self.count
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return min(BASE**bucket, self.max)
+        return self.max
+
+    def summary(self) -> dict[str, float]:
+        return {
+            "count": self.count,
+            "mean_us": self.total / self.count if self.count else 0.0,
+            "p50_us": self.percentile(0.5),
+            "p90_us": self.percentile(0.9),
+            "p99_us": self.percentile(0.99),
+            "max_us": self.max,
+        }
+
+
+class Tracer:
+    def __init__(self, malloc: bool = False):
+        self.histograms: dict[str, Histogram] = {}
+        self.events: deque[tuple[str, int, float, float]] = deque(maxlen=EVENTS)
+        self.marks: dict[str, float] = {}
+        self.snapshots: list[dict[str, Any]] = []
+        self.lock = threading.Lock()
+        self.origin = time.perf_counter()
+        self.malloc = malloc
+        self.baseline = None
+        if malloc:
+            import tracemalloc
+
+            tracemalloc.start(8)
+
+    def add(self, name: str, start: float, end: float):
+        us = (end - start) * 1e6
+        with self.lock:
+            if (histogram := self.histograms.get(name)) is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.add(us)
+            ts = (start - self.origin) * 1e6
+            self.events.append((name, threading.get_ident(), ts, us))
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, start, time.perf_counter())
+
+    def mark(self, name: str):
+        self.marks[name] = time.perf_counter()
+
+    def since(self, mark: str, name: str):
+        if (start := self.marks.pop(mark, None)) is not None:
+            self.add(name, start, time.perf_counter())
+
+    def snapshot(self, label: str):
+        if not self.malloc:
+            return
+        import tracemalloc
+
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        top = []
+        if self.baseline is not None:
+            stats = snapshot.compare_to(self.baseline, "lineno")[:10]
+            top = [str(stat) for stat in stats]
+        self.baseline = snapshot
+        self.snapshots.append(
+            {"label": label, "current": current, "peak": peak, "growth": top}
+        )
+
+    def summary(self) -> dict[str, Any]:
+        with self.lock:
+            spans = {k: h.summary() for k, h in sorted(self.histograms.items())}
+        return {"spans": spans, "memory": self.snapshots}
+
+    def trace(self) -> dict[str, Any]:
+        pid = os.getpid()
+        with self.lock:
+            events = [
+                {"name": name, "ph": "X", "pid": pid, "tid": tid, "ts": ts, "dur": us}
+                for name, tid, ts, us in self.events
+            ]
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export(self, trace: str | None = None, summary: str | None = None):
+        with atomic_write(trace or TRACE) as file:
+            json.dump(self.trace(), file)
+        with atomic_write(summary or SUMMARY) as file:
+            json.dump(self.summary(), file, indent=2)
+
+
+NULL: ContextManager[None] = nullcontext()
+
+tracer: Tracer | None = None
+
+
+def enable(malloc: bool = False) -> Tracer:
+    global tracer
+    if tracer is None:
+        tracer = Tracer(malloc)
+    return tracer
+
+
+def span(name: str) -> ContextManager[None]:
+    if tracer is None:
+        return NULL
+    return tracer.span(name)
+
+
+def mark(name: str):
+    if tracer:
+        tracer.mark(name)
+
+
+def since(mark: str, name: str):
+    if tracer:
+        tracer.since(mark, name)
+
+
+def snapshot(label: str):
+    if tracer:
+        tracer.snapshot(label)
+
+
+def timed(name: str) -> Callable[[F], F]:
+    def decorator(func: F) -> F:
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if tracer is None:
+                return func(*args, **kwargs)
+            with tracer.span(name):
+                return func(*args, **kwargs)
+
+        return wrapper  # type: ignore
+
+    return decorator
+
+
+def export():
+    if tracer:
+        tracer.export()
+
+
+if value := os.environ.get("DUO3_TRACE"):
+    enable(malloc=value == "malloc")
@@ -1,41 +1,118 @@
 from __future__ import annotations
 
 import random
-from collections.abc import Iterator, Sequence
+from collections import OrderedDict
+from collections.abc import Callable, Sequence
+from typing import Any
 
+from kivy.core.text import Label as CoreLabel
+from kivy.graphics.texture import Texture
+from kivy.properties import NumericProperty, ObjectProperty
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.button import Button
-from kivy.uix.gridlayout import GridLayout
 from kivy.uix.label import Label
+from kivy.uix.recycleboxlayout import RecycleBoxLayout
+from kivy.uix.recyclegridlayout import RecycleGridLayout
+from kivy.uix.recycleview import RecycleView
+from kivy.uix.recycleview.views import RecycleDataViewBehavior
 from kivy.uix.togglebutton import ToggleButton
+from kivy.uix.widget import Widget
 
+import duo3.trace
 
-class SectionSelector(GridLayout):
-    def __init__(self, height=90, **kwargs):
+
+class SelectorButton(RecycleDataViewBehavior, ToggleButton):
+    value = NumericProperty(0)
+
+    def __init__(self, **kwargs):
+        super().__init__(font_size=18, **kwargs)
+        self.selector: Selector | None = None
+
+    def refresh_view_attrs(self, rv, index, data):
+        self.selector = rv
+        return super().refresh_view_attrs(rv, index, data)
+
+    def on_release(self):
+        if self.selector:
+            self.selector.toggle(self.value)
+
+
+class Selector(RecycleView):
+    selected = ObjectProperty(None, allownone=True)
+
+    def __init__(self, layout: Widget, **kwargs):
+        super().__init__(**kwargs)
+        self.viewclass = SelectorButton
+        self.add_widget(layout)
+        self.index: dict[int, int] = {}
+        self.previous: int | None = None
+
+    @property
+    def values(self) -> list[int]:
+        return list(self.index)
+
+    def set_items(self, values: Sequence[int], colors: Sequence[str] | None = None):
+        if colors is None:
+            colors = ["EEEEEE"] * len(values)
+        self.index = {value: k for k, value in enumerate(values)}
+        if self.selected not in self.index:
+            self.selected = None
+        self.previous = self.selected
+        self.data = [
+            {
+                "value": value,
+                "text": str(value),
+                "color": color,
+                "state": "down" if value == self.selected else "normal",
+            }
+            for value, color in zip(values, colors)
+        ]
+
+    def set_colors(self, colors: dict[int, str]):
+        for value, color in colors.items():
+            if (k := self.index.get(value)) is not None:
+                self.data[k]["color"] = color
+        self.refresh_from_data()
+
+    def toggle(self, value: int):
+        self.selected = None if self.selected == value else value
+
+    def on_selected(self, instance, value: int | None):
+        for v, state in [(self.previous, "normal"), (value, "down")]:
+            if v is not None and v in self.index:
+                self.data[self.index[v]]["state"] = state
+        self.previous = value
+        self.refresh_from_data()
+
+
+class SectionSelector(BoxLayout):
+    selected = ObjectProperty(None, allownone=True)
+
+    def __init__(self, height=90, cols=15, **kwargs):
         super().__init__(size_hint_y=None, height=height, **kwargs)
-        self.cols = 16
-        for s in range(48):
-            if s == 0:
-                button = Label(
-                    text="Section",
-                    size_hint=(None, None),
-                    size=(100, self.height // 3),
-                    # font_name="Times",
-                    font_size=18,
-                )
-            elif s % 16 == 0:
-                button = self.control_button(s // 16 - 1)
-            else:
-                text = str(s - (s // 16))
-                button = ToggleButton(
-                    text=text,
-                    size_hint_y=None,
-                    height=height // 3,
-                    # font_name="Times",
-                    font_size=18,
-                    group="section_group",
-                )
-            self.add_widget(button)
+        row = height // 3
+        column = BoxLayout(orientation="vertical", size_hint_x=None, width=100)
+        label = Label(
+            text="Section",
+            size_hint=(None, None),
+            size=(100, row),
+            # font_name="Times",
+            font_size=18,
+        )
+        column.add_widget(label)
+        column.add_widget(self.control_button(0))
+        column.add_widget(self.control_button(1))
+        self.add_widget(column)
+        layout = RecycleGridLayout(
+            cols=cols,
+            default_size=(None, row),
+            default_size_hint=(1, None),
+            size_hint_y=None,
+        )
+        layout.bind(minimum_height=layout.setter("height"))
+        self.selector = Selector(layout, do_scroll_x=False)
+        self.selector.bind(selected=self.setter("selected"))
+        self.add_widget(self.selector)
 
     def control_button(self, index: int) -> Button:
         text = ["Clear", "Random"][index]
@@ -50,40 +127,36 @@ class SectionSelector(GridLayout):
         button.on_release = on_release
         return button
 
-    def __iter__(self) -> Iterator[ToggleButton]:
-        for button in self.children:
-            if isinstance(button, ToggleButton):
-                yield button
-
     @property
     def sections(self) -> list[int]:
-        sections = []
-        for button in self:
-            if button.state == "down":
-                sections.append(int(button.text))
-        sections.sort()
-        return sections
+        if self.selected is None:
+            return []
+        return [self.selected]
+
+    def set_sections(
+        self, sections: Sequence[int], colors: Sequence[str] | None = None
+    ):
+        self.selector.set_items(sections, colors)
+
+    def set_colors(self, colors: dict[int, str]):
+        self.selector.set_colors(colors)
 
     def clear(self):
-        for button in self:
-            if button.state != "normal":
-                button.state = "normal"
+        self.selector.selected = None
 
     def random(self, nos: Sequence[int] | None = None):
         if nos is None:
-            nos = range(1, 46)
+            nos = self.selector.values
         self.clear()
-        no = random.choice(nos)
-        for button in self:
-            if int(button.text) == no:
-                button.state = "down"
-                return
+        if nos:
+            self.selector.selected = random.choice(nos)
 
 
 class SentenceSelector(BoxLayout):
-    def __init__(self, height=30, **kwargs):
+    selected = ObjectProperty(None, allownone=True)
+
+    def __init__(self, height=30, width=60, **kwargs):
         super().__init__(size_hint_y=None, height=height, **kwargs)
-        self.sentences: list[ToggleButton] = []
         label = Label(
             text="Sentence",
             size_hint=(None, None),
@@ -92,39 +165,101 @@ class SentenceSelector(BoxLayout):
             font_size=18,
         )
         self.add_widget(label)
-        for s in range(17):
-            button = ToggleButton(
-                text="",
-                size_hint_y=None,
-                height=height,
-                # font_name="Times",
-                font_size=18,
-                group="sentence-group",
-            )
-            self.add_widget(button)
-            self.sentences.append(button)
-
-    def __getitem__(self, index: int) -> ToggleButton:
-        return self.sentences[index]
+        layout = RecycleBoxLayout(
+            orientation="horizontal",
+            default_size=(width, height),
+            default_size_hint=(None, None),
+            size_hint_x=None,
+        )
+        layout.bind(minimum_width=layout.setter("width"))
+        self.selector = Selector(layout, do_scroll_y=False)
+        self.selector.bind(selected=self.setter("selected"))
+        self.add_widget(self.selector)
 
     def __len__(self) -> int:
-        return len(self.sentences)
-
-    def __iter__(self) -> Iterator[ToggleButton]:
-        for button in self.sentences:
-            yield button
+        return len(self.selector.data)
 
     def set_sentence_numbers(self, nos: list[int], cs: list[str]):
-        self.clear()
-        for b, no, c in zip(self, nos, cs):
-            b.text = str(no)
-            b.color = c
+        self.unselect()
+        self.selector.set_items(nos, cs)
+        self.selector.scroll_x = 0
 
     def unselect(self):
-        for button in self:
-            button.state = "normal"
+        self.selector.selected = None
 
     def clear(self):
-        for button in self:
-            button.text = ""
-            button.state = "normal"
+        self.selector.set_items([])
+
+
+class TextureCache:
+    def __init__(self, capacity: int = 8):
+        self.capacity = capacity
+        self.textures: OrderedDict[tuple, Texture] = OrderedDict()
+
+    def __contains__(self, key: tuple) -> bool:
+        return key in self.textures
+
+    def get(self, key: tuple) -> Texture | None:
+        if texture := self.textures.get(key):
+            self.textures.move_to_end(key)
+        return texture
+
+    def put(self, key: tuple, texture: Texture):
+        self.textures[key] = texture
+        self.textures.move_to_end(key)
+        while len(self.textures) > self.capacity:
+            self.textures.popitem(last=False)
+
+
+class PrerenderedLabel(Label):
+    def __init__(self, capacity: int = 8, **kwargs):
+        self.cache = TextureCache(capacity)
+        super().__init__(**kwargs)
+
+    def key(self, text: str) -> tuple:
+        names = [name for name in self._font_properties if name != "text"]
+        return (text, repr([getattr(self, name) for name in names]))
+
+    def prerender(self, text: str):
+        key = self.key(text)
+        if not text or key in self.cache:
+            return
+        options = {name: getattr(self, name) for name in self._font_properties}
+        options["text"] = text
+        options["usersize"] = self.text_size
+        label = CoreLabel(**options)
+        label.refresh()
+        if texture := label.texture:
+            texture.bind()
+            self.cache.put(key, texture)
+
+    def texture_update(self, *largs):
+        if texture := self.cache.get(self.key(self.text)):
+            self.texture = texture
+            self.texture_size = list(texture.size)
+            self.is_shortened = False
+        else:
+            with duo3.trace.span("label.texture"):
+                super().texture_update(*largs)
+
+
+class Updates:
+    def __init__(self, schedule: Callable[[], Any]):
+        self.schedule = schedule
+        self.pending: dict[tuple[object, str], Any] = {}
+        self.applied: dict[tuple[object, str], Any] = {}
+
+    def set(self, target: object, **values):
+        for name, value in values.items():
+            self.pending[(target, name)] = value
+        self.schedule()
+
+    def apply(self) -> int:
+        pending, self.pending = self.pending, {}
+        count = 0
+        for key, value in pending.items():
+            if key not in self.applied or self.applied[key] != value:
+                setattr(*key, value)
+                self.applied[key] = value
+                count += 1
+        return count
@@ -72,6 +72,13 @@ setup(
     packages=get_packages("duo3"),
     include_package_data=True,
     install_requires=["kivy"],
+    extras_require={"analytics": ["numpy"]},
     python_requires=">=3.9",
-    entry_points={"console_scripts": ["duo3 = duo3.app:main"]},
+    entry_points={
+        "console_scripts": [
+            "duo3 = duo3.app:main",
+            "duo3-console = duo3.console:main",
+            "duo3-server = duo3.server:main",
+        ]
+    },
 )
@@ -1,8 +1,20 @@
 import pytest
 
 import duo3.sentence
+from duo3.sentence import Sentence, Sentences
 
 
 @pytest.fixture(scope="session")
 def sentences():
     yield duo3.sentence.read()
+
+
+@pytest.fixture
+def corpus():
+    return Sentences(
+        [
+            Sentence(1, 1, "Go.", "行け。"),
+            Sentence(1, 2, "No!", "だめ！"),
+            Sentence(2, 3, "Hi.", "やあ。"),
+        ]
+    )
@@ -0,0 +1,84 @@
+import threading
+
+import pytest
+
+import duo3.audio
+from duo3.audio import Cache
+from duo3.executor import Executor
+
+
+class Sound:
+    def __init__(self, no: int):
+        self.no = no
+        self.unloaded = False
+
+    def unload(self):
+        self.unloaded = True
+
+
+@pytest.fixture
+def reads(monkeypatch):
+    reads: list[int] = []
+
+    def read(no: int) -> Sound:
+        reads.append(no)
+        return Sound(no)
+
+    monkeypatch.setattr(duo3.audio, "read", read)
+    return reads
+
+
+def test_request_waits_for_prefetch(reads):
+    executor = Executor(workers=1)
+    started, gate = threading.Event(), threading.Event()
+    executor.submit(lambda: started.set() or gate.wait())
+    started.wait(5)
+    cache = Cache(executor=executor)
+    delivered: list = []
+    cache.prefetch(1)
+    cache.request(1, delivered.append)
+    cache.request(2, delivered.append)
+    gate.set()
+    assert executor.join(5)
+    assert sorted(sound.no for sound in delivered) == [1, 2]
+    assert reads.count(1) == 1
+    assert cache.misses == 1
+    cache.request(1, delivered.append)
+    assert delivered[-1].no == 1 and cache.hits == 1
+    executor.shutdown()
+
+
+def test_get(reads):
+    cache = Cache(capacity=2)
+    first = cache.get(1)
+    assert cache.get(1) is first
+    assert (cache.hits, cache.misses) == (1, 1)
+    cache.get(2)
+    cache.get(1)
+    cache.get(3)
+    assert list(cache.sounds) == [1, 3]
+    assert reads == [1, 2, 3]
+    assert not first.unloaded
+    cache.get(2)
+    assert first.unloaded
+    cache.clear()
+    assert len(cache) == 0
+
+
+def test_put_replaces(reads):
+    cache = Cache()
+    old = cache.get(1)
+    cache.put(1, Sound(1))
+    assert old.unloaded
+    cache.put(1, cache.sounds[1])
+    assert not cache.sounds[1].unloaded
+
+
+def test_prefetch(reads):
+    cache = Cache()
+    cache.prefetch(4)
+    sound = cache.get(4)
+    assert sound.no == 4
+    cache.prefetch(4)
+    assert reads == [4]
+    assert 4 in cache and cache.misses == 0
@@ -0,0 +1,42 @@
+import math
+import wave
+from array import array
+
+import duo3.bank
+from duo3.bank import Bank, open_bank
+
+
+def write(path, samples):
+    with wave.open(str(path), "wb") as file:
+        file.setnchannels(1)
+        file.setsampwidth(2)
+        file.setframerate(duo3.bank.RATE)
+        file.writeframes(array("h", samples).tobytes())
+
+
+def tone(n, amplitude):
+    return [round(amplitude * math.sin(k / 5)) for k in range(n)]
+
+
+def test_bank(tmp_path):
+    source = tmp_path / "audio"
+    source.mkdir()
+    write(source / "DUO_001.wav", [0] * 5000 + tone(2000, 1000) + [0] * 5000)
+    write(source / "DUO_002.wav", tone(3000, 20000))
+    path = str(tmp_path / "audio.bank")
+    duo3.bank.build(str(source), path, workers=2)
+
+    bank = open_bank(path, str(source))
+    assert isinstance(bank, Bank)
+    assert len(bank) == 2
+    clip = array("h")
+    clip.frombytes(bank.clip(1))
+    assert 2000 - 10 < len(clip) <= 2000 + 2 * duo3.bank.PADDING
+    assert max(clip) <= duo3.bank.PEAK
+    wav = bank.wav(2, str(tmp_path / "wav"))
+    with wave.open(wav, "rb") as file:
+        assert file.getnframes() == len(bank.clip(2)) // 2
+    bank.close()
+
+    write(source / "DUO_003.wav", tone(100, 1000))
+    assert open_bank(path, str(source)) is None
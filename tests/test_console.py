@@ -0,0 +1,89 @@
+import curses
+
+from duo3.console import Console, translate, wrap
+from duo3.history import History, Storage
+
+
+class Screen:
+    def __init__(self, keys=()):
+        self.keys = list(keys)
+        self.lines: dict[int, str] = {}
+
+    def getmaxyx(self):
+        return 24, 80
+
+    def erase(self):
+        self.lines.clear()
+
+    def refresh(self):
+        pass
+
+    def addstr(self, y, x, text, attr=0):
+        line = self.lines.get(y, "").ljust(x)
+        self.lines[y] = line[:x] + text
+
+    def get_wch(self):
+        return self.keys.pop(0)
+
+    def text(self) -> str:
+        return "\n".join(self.lines[y] for y in sorted(self.lines))
+
+
+def test_translate():
+    assert translate("A") == "a"
+    assert translate("\t") == "tab"
+    assert translate("\x1b") == "escape"
+    assert translate(" ") == "spacebar"
+    assert translate("\n") == "enter"
+    assert translate(curses.KEY_RIGHT) == "right"
+    assert translate(-1) == ""
+
+
+def test_wrap():
+    assert wrap("We must respect the will", 10) == ["We must", "respect", "the will"]
+    assert wrap("私たちは個人", 6) == ["私たち", "は個人"]
+
+
+def test_console(corpus):
+    keys = ["\n", "g", "o", "x", "\n", "n", "o", "\n", "q"]
+    screen = Screen(keys)
+    history = History(storage=Storage())
+    history.append(3, 0)
+    console = Console(screen, corpus, history)
+    console.draw()
+    assert " 1:  2" in screen.text()
+    assert " 2:  0" in screen.text()
+    console.handle(translate(screen.get_wch()))
+    assert len(console.session.problems) == 2
+    console.session.problems.sort(key=lambda problem: problem.no)
+    console.draw()
+    assert "Step 1/2" in screen.text()
+    assert "行け。" in screen.text()
+    console.run()
+    assert history.get(1) == "D0"
+    assert history.get(2) == "D0"
+    assert console.session.problems == []
+    assert console.message == "Finished 2/2: deduction 0"
+    assert console.tracker.count(1) == 0
+
+
+class Writer:
+    def __init__(self):
+        self.flushes = 0
+
+    def schedule(self):
+        pass
+
+    def flush(self):
+        self.flushes += 1
+
+
+def test_escape_flushes(corpus):
+    writer = Writer()
+    console = Console(Screen(), corpus, History(storage=Storage()), writer=writer)
+    console.handle("escape")
+    assert writer.flushes == 1
+    console.handle("enter")
+    console.handle("escape")
+    assert writer.flushes == 2
+    assert console.session.problems == []
@@ -0,0 +1,95 @@
+import csv
+import os
+
+import duo3.corpus
+import duo3.sentence
+from duo3.corpus import MappedSentences
+from duo3.sentence import Sentence, Sentences
+
+ROWS = [
+    (2, 3, "Hi.", "やあ。"),
+    (1, 1, "I'm OK.", "大丈夫。"),
+    (1, 2, "The cat.", "猫。"),
+    (3, 10, "Good-bye, café.", "さようなら。"),
+]
+
+
+def write(path, rows):
+    with open(path, "w", encoding="utf8") as file:
+        csv.writer(file, lineterminator="\n").writerows(rows)
+
+
+def test_corpus(tmp_path):
+    source = str(tmp_path / "text.csv")
+    write(source, ROWS)
+    sentences = duo3.corpus.read(source)
+    assert os.path.exists(tmp_path / "text.bin")
+    expected = Sentences([Sentence(*row) for row in ROWS])
+    assert isinstance(sentences, MappedSentences)
+    assert len(sentences) == 4
+    assert len(sentences.sentences.cache) == 0
+    assert list(sentences) == list(expected)
+    assert sentences.sections == [1, 2, 3]
+    assert list(sentences.no_array) == [1, 2, 3, 10]
+    assert list(sentences.section_array) == [1, 1, 2, 3]
+    assert list(sentences.length_array) == list(expected.length_array)
+    assert sentences.get(10).english == "Good-bye, café."
+    assert list(sentences.get(10).positions) == list(expected.get(10).positions)
+    assert list(sentences.noiter([1, 3])) == [1, 2, 10]
+    assert sorted(s.no for s in sentences.sample([1, 2])) == [1, 2, 3]
+    assert [s.no for s in sentences.sentenceiter(1)] == [1, 2]
+    sentences.close()
+
+
+def test_rebuild(tmp_path):
+    source = str(tmp_path / "text.csv")
+    write(source, ROWS)
+    duo3.corpus.read(source).close()
+    write(source, ROWS[:2])
+    stat = os.stat(source)
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    sentences = duo3.corpus.read(source)
+    assert [s.no for s in sentences] == [1, 3]
+    sentences.close()
+
+    with open(tmp_path / "text.bin", "r+b") as file:
+        file.truncate(60)
+    sentences = duo3.corpus.read(source)
+    assert [s.no for s in sentences] == [1, 3]
+    sentences.close()
+
+
+def test_read(sentences):
+    assert isinstance(sentences, MappedSentences)
+    rows = list(duo3.sentence.load(duo3.sentence.PATH))
+    assert len(sentences) == len(rows)
+    first = min(rows, key=lambda row: row[1])
+    assert sentences.get(first[1]) == Sentence(*first)
+
+
+def test_mapped_attributes(tmp_path):
+    source = str(tmp_path / "text.csv")
+    long = "a" * 70000 + "."
+    write(source, [*ROWS, (4, 11, long, "長い。")])
+    sentences = duo3.corpus.read(source)
+    assert sentences.length_array[-1] == len(long)
+    assert sentences.get(11).english == long
+    assert dict(sentences.positions) == {1: 0, 2: 1, 3: 2, 10: 3, 11: 4}
+    assert 10 in sentences.positions and 4 not in sentences.positions
+    assert Sentences.get(sentences, 3).english == "Hi."
+    sentences.close()
+
+
+def test_sentence_cache(tmp_path):
+    source = str(tmp_path / "text.csv")
+    write(source, ROWS)
+    sentences = duo3.corpus.read(source)
+    cache = sentences.sentences
+    cache.capacity = 2
+    first = cache[0]
+    cache[1]
+    assert cache[0] is first
+    cache[2]
+    assert list(cache.cache) == [0, 2]
+    assert cache[0] is first
+    sentences.close()
@@ -0,0 +1,189 @@
+import os
+import threading
+
+import pytest
+
+import duo3.errorlog
+from duo3.errorlog import ErrorLog
+from duo3.executor import Executor
+from duo3.sentence import Attempt, Sentence, Sentences
+
+np = pytest.importorskip("numpy")
+
+
+def corpus() -> Sentences:
+    return Sentences(
+        [
+            Sentence(1, 1, "I'm OK.", "大丈夫。"),
+            Sentence(1, 2, "The cat.", "猫。"),
+            Sentence(2, 3, "OK, cat.", "よし、猫。"),
+        ]
+    )
+
+
+def attempt(sentence: Sentence, keys: str) -> Attempt:
+    attempt = Attempt(sentence)
+    for key in keys.split():
+        attempt.input(key)
+    return attempt
+
+
+def write(path: str):
+    sentences = corpus()
+    log = ErrorLog(path)
+    log.append(attempt(sentences.get(1), "i m o k"), 1)
+    log.append(attempt(sentences.get(1), "i m x x o tab"), 2)
+    log.append(attempt(sentences.get(2), "t h e c a t"), 3)
+    log.append(attempt(sentences.get(3), "o k c s a t"), 4)
+    log.close()
+    index, _, _ = duo3.errorlog.paths(path)
+    with open(index, "ab") as file:
+        file.write(b"\x01\x00")
+
+
+def test_errorlog(tmp_path):
+    path = str(tmp_path / "attempts")
+    write(path)
+    entries = list(duo3.errorlog.read(path))
+    assert [e.no for e in entries] == [1, 1, 2, 3]
+    assert entries[1].time == 2
+    assert entries[1].mistakes == [(4, 120), (4, 120), (5, 9)]
+    assert entries[1].state == bytes([1, 1, 1, 1, 2, 5, 1])
+
+
+def test_analytics(tmp_path):
+    import duo3.analytics
+
+    path = str(tmp_path / "attempts")
+    write(path)
+    analytics = duo3.analytics.read(corpus(), path)
+    assert len(analytics.log) == 4
+    rates = analytics.letter_error_rates()
+    assert rates["o"] == 1 / 3
+    assert rates["k"] == 1 / 3
+    assert rates["a"] == 1 / 2
+    assert rates["t"] == 0
+    words = analytics.word_error_rates()
+    assert words["ok"] == (1 / 3, 3)
+    assert words["cat"] == (1 / 2, 2)
+    assert words["the"] == (0, 1)
+    assert analytics.weakest_words() == ["cat", "ok"]
+    assert analytics.confusions() == [("o", "x", 2), ("a", "s", 1), ("k", "tab", 1)]
+    assert analytics.hardest(1) == [(1, 0.5 / 2)]
+    assert [s.no for s in analytics.weakest([1, 2])] == [3, 2, 1]
+    assert [s.no for s in analytics.weakest([1])] == [2, 1]
+
+
+def test_analytics_empty(tmp_path):
+    import duo3.analytics
+
+    analytics = duo3.analytics.read(corpus(), str(tmp_path / "none"))
+    assert analytics.letter_error_rates() == {}
+    assert analytics.weakest([1]) == []
+    assert analytics.hardest(1) == []
+
+
+def test_analytics_torn(tmp_path):
+    import duo3.analytics
+
+    path = str(tmp_path / "attempts")
+    write(path)
+    index, state, _ = duo3.errorlog.paths(path)
+    with open(state, "r+b") as file:
+        file.truncate(os.path.getsize(state) - 3)
+    analytics = duo3.analytics.read(corpus(), path)
+    assert len(analytics.log) == 3
+    assert [e.no for e in duo3.errorlog.read(path)] == [1, 1, 2]
+    assert analytics.word_error_rates()["ok"] == (1 / 2, 2)
+
+    with open(index, "r+b") as file:
+        file.truncate(2 * duo3.errorlog.INDEX.size + 5)
+    analytics = duo3.analytics.read(corpus(), path)
+    assert len(analytics.log) == 2
+    assert analytics.letter_error_rates()["o"] == 1 / 2
+
+
+def test_executor(tmp_path):
+    path = str(tmp_path / "attempts")
+    executor = Executor()
+    log = ErrorLog(path, executor)
+    sentence = corpus().get(2)
+    for k in range(50):
+        log.append(attempt(sentence, "t h x e c a t"), k)
+    log.close()
+    executor.shutdown()
+    entries = list(duo3.errorlog.read(path))
+    assert [e.time for e in entries] == list(range(50))
+    assert all(e.mistakes == [(2, 120)] for e in entries)
+
+
+def test_append_torn(tmp_path):
+    path = str(tmp_path / "attempts")
+    write(path)
+    before = list(duo3.errorlog.read(path))
+    index, state, mistakes = duo3.errorlog.paths(path)
+    with open(state, "r+b") as file:
+        file.truncate(os.path.getsize(state) - 3)
+    with open(mistakes, "ab") as file:
+        file.write(b"\x07")
+    retry = attempt(corpus().get(1), "i m x o k")
+    log = ErrorLog(path)
+    log.append(retry, 5)
+    log.close()
+    assert os.path.getsize(index) == 4 * duo3.errorlog.INDEX.size
+    entries = list(duo3.errorlog.read(path))
+    assert entries[:3] == before[:3]
+    assert entries[3].no == 1 and entries[3].time == 5
+    assert entries[3].mistakes == [(4, 120)]
+    assert entries[3].state == retry.state.tobytes()
+
+
+def test_close_timeout(tmp_path, monkeypatch):
+    path = str(tmp_path / "attempts")
+    executor = Executor(workers=1)
+    log = ErrorLog(path, executor)
+    sentence = corpus().get(2)
+    started, gate = threading.Event(), threading.Event()
+    executor.submit(lambda: started.set() or gate.wait(), name="gate")
+    assert started.wait(5)
+    log.append(attempt(sentence, "t h e c a t"), 1)
+    log.close(0.01)
+    assert [e.time for e in duo3.errorlog.read(path)] == [1]
+    gate.set()
+    assert executor.join(5)
+
+    started.clear()
+    gate.clear()
+    write = ErrorLog.write
+
+    def slow(self):
+        started.set()
+        gate.wait()
+        write(self)
+
+    monkeypatch.setattr(ErrorLog, "write", slow)
+    log = ErrorLog(path, executor)
+    log.append(attempt(sentence, "t h e c a t"), 2)
+    assert started.wait(5)
+    with pytest.raises(TimeoutError):
+        log.close(0.01)
+    gate.set()
+    assert executor.join(5)
+    log.close()
+    executor.shutdown()
+    assert [e.time for e in duo3.errorlog.read(path)] == [1, 2]
+
+
+def test_analytics_corpus(tmp_path):
+    import duo3.analytics
+
+    path = str(tmp_path / "attempts")
+    write(path)
+    first = duo3.analytics.read(corpus(), path)
+    log = ErrorLog(path)
+    log.append(attempt(corpus().get(3), "o k x c a t"), 5)
+    log.close()
+    again = duo3.analytics.read(first.corpus, path)
+    assert again.corpus is first.corpus
+    assert len(again.log) == len(first.log) + 1
+    assert again.word_error_rates()["ok"][1] == 4
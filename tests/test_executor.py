@@ -0,0 +1,170 @@
+import threading
+
+import pytest
+
+import duo3.executor
+import duo3.history
+from duo3.executor import HIGH, LOW, Executor
+from duo3.history import History
+
+
+def block(executor: Executor) -> threading.Event:
+    started, gate = threading.Event(), threading.Event()
+    executor.submit(lambda: started.set() or gate.wait(), name="gate")
+    started.wait(5)
+    return gate
+
+
+def test_priority():
+    executor = Executor(workers=1)
+    order: list[str] = []
+    gate = block(executor)
+    for name, priority in [("low", LOW), ("normal", 10), ("high", HIGH)]:
+        executor.submit(order.append, name, priority=priority, name=name)
+    assert executor.stats()["depth"] == 3
+    gate.set()
+    assert executor.join(5)
+    assert order == ["high", "normal", "low"]
+    stats = executor.stats()
+    assert stats["max_depth"] == 3
+    assert stats["tasks"]["high"]["duration"]["count"] == 1
+    executor.shutdown()
+
+
+def test_cancel():
+    executor = Executor(workers=1)
+    delivered: list = []
+    gate = block(executor)
+    task = executor.submit(lambda: 1, callback=delivered.append, name="cancelled")
+    assert task.cancel()
+    gate.set()
+    assert executor.join(5)
+    assert task.done() and task.state == "cancelled"
+    assert not task.cancel()
+    assert delivered == []
+    assert executor.stats()["tasks"]["cancelled"]["cancelled"] == 1
+    executor.shutdown()
+
+
+def test_deliver():
+    queue: list = []
+    executor = Executor(deliver=queue.append)
+    results: list = []
+
+    def work(n: int) -> int:
+        for k in range(n):
+            duo3.executor.report(k + 1, n)
+        return n * 2
+
+    task = executor.submit(
+        work, 3, callback=results.append, progress=lambda *p: results.append(p)
+    )
+    failed = executor.submit(
+        lambda: 1 / 0, errback=lambda e: results.append(type(e).__name__)
+    )
+    assert task.wait(5) and failed.wait(5)
+    assert executor.join(5)
+    assert task.result == 6 and failed.state == "failed"
+    assert results == []
+    for fn in queue:
+        fn()
+    assert results.index(6) > results.index((3, 3))
+    assert "ZeroDivisionError" in results
+    executor.shutdown()
+    assert not any(thread.is_alive() for thread in executor.threads)
+
+
+def test_writer(tmp_path, monkeypatch):
+    monkeypatch.setattr(duo3.history, "PATH", str(tmp_path / "history.csv"))
+    history = History()
+    executor = Executor()
+    writer = duo3.history.Writer(history, executor)
+    for no in range(1, 101):
+        history.append(no, no % 3)
+        writer.schedule()
+    writer.close(5)
+    assert 1 <= writer.writes <= 100
+    assert executor.stats()["tasks"]["history.save"]["duration"]["count"] >= 1
+    assert duo3.history.read().get(100) == "D1"
+    executor.shutdown()
+
+
+def test_writer_cancelled(tmp_path, monkeypatch):
+    monkeypatch.setattr(duo3.history, "PATH", str(tmp_path / "history.csv"))
+    history = History()
+    executor = Executor(workers=1)
+    writer = duo3.history.Writer(history, executor)
+    gate = block(executor)
+    history.append(1, 0)
+    writer.schedule()
+    assert writer.task and writer.task.cancel()
+    gate.set()
+    assert executor.join(5)
+    assert writer.writes == 0
+    assert writer.flush(5)
+    assert duo3.history.read().get(1) == "D0"
+
+    gate = block(executor)
+    history.append(2, 1)
+    writer.schedule()
+    assert writer.task and writer.task.cancel()
+    history.append(3, 2)
+    writer.schedule()
+    assert not writer.flush(0.01)
+    gate.set()
+    assert writer.flush(5)
+    assert duo3.history.read().get(3) == "D2"
+    writer.close(5)
+    executor.shutdown()
+
+
+def test_settle():
+    executor = Executor(workers=1)
+    gate = block(executor)
+    queued = executor.submit(lambda: 1, name="queued")
+    assert queued.settle(0.01)
+    assert queued.state == "cancelled"
+    gate.set()
+    assert executor.join(5)
+    started, gate = threading.Event(), threading.Event()
+    running = executor.submit(lambda: started.set() or gate.wait(), name="running")
+    assert started.wait(5)
+    assert not running.settle(0.01)
+    assert running.state == "running" and not running.cancelled
+    gate.set()
+    assert running.settle(5)
+    assert running.state == "done"
+    executor.shutdown()
+
+
+def test_writer_close(tmp_path, monkeypatch):
+    monkeypatch.setattr(duo3.history, "PATH", str(tmp_path / "history.csv"))
+    history = History()
+    executor = Executor(workers=1)
+    writer = duo3.history.Writer(history, executor)
+    gate = block(executor)
+    history.append(1, 0)
+    writer.schedule()
+    writer.close(0.01)
+    assert writer.task is None and writer.writes == 1
+    assert duo3.history.read().get(1) == "D0"
+    gate.set()
+
+    started = threading.Event()
+    save = history.save
+
+    def slow():
+        started.set()
+        gate.wait()
+        save()
+
+    monkeypatch.setattr(history, "save", slow)
+    gate = threading.Event()
+    writer = duo3.history.Writer(history, executor)
+    writer.schedule()
+    assert started.wait(5)
+    with pytest.raises(TimeoutError):
+        writer.close(0.01)
+    gate.set()
+    assert executor.join(5)
+    executor.shutdown()
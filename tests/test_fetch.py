@@ -0,0 +1,124 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import duo3.sentence
+
+SECTIONS = {1: [1, 2, 3], 2: [4, 5], 3: [6, 7, 8, 9]}
+EMPTY = 5
+
+
+def page(section: int) -> bytes:
+    nos = SECTIONS.get(section, [])
+    ps = [f"<p>{no} Sentence {chr(96 + no)}. {no} 文です</p>" for no in nos]
+    html = f"<html><body><p>Section</p>{''.join(ps)}<p>End</p></body></html>"
+    return html.encode("utf8")
+
+
+class Handler(BaseHTTPRequestHandler):
+    sections: list[int] = []
+
+    def do_GET(self):
+        section = int(self.path[-7:-5])
+        self.sections.append(section)
+        if section not in SECTIONS and section != EMPTY:
+            self.send_error(404)
+            return
+        body = page(section)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/section{{:02d}}.html"
+    server.shutdown()
+
+
+def test_fetch(url):
+    rows = list(duo3.sentence.fetch(url, SECTIONS, workers=3))
+    assert [row[:2] for row in rows] == [
+        (s, no) for s, nos in SECTIONS.items() for no in nos
+    ]
+    assert rows[0][2:] == ("Sentence a.", "文です。")
+
+
+def test_fetch_continuity(url):
+    with pytest.raises(AssertionError):
+        list(duo3.sentence.fetch(url, [1, 3]))
+
+
+def test_save(url, tmp_path, monkeypatch):
+    monkeypatch.setattr(duo3.sentence, "PATH", str(tmp_path / "text.csv"))
+    monkeypatch.setattr(duo3.sentence, "CACHE", str(tmp_path / "sections"))
+    Handler.sections.clear()
+    with pytest.raises(Exception):
+        duo3.sentence.save(url, sections=[1, 2, 3, 4])
+    assert not (tmp_path / "text.csv").exists()
+    assert sorted(Handler.sections) == [1, 2, 3, 4]
+
+    Handler.sections.clear()
+    duo3.sentence.save(url, sections=[1, 2, 3])
+    assert Handler.sections == []
+    cache = duo3.sentence.Cache()
+    assert cache.is_complete(str(tmp_path / "text.csv"), [1, 2, 3])
+
+    (tmp_path / "sections" / "section02.csv").write_text("corrupt")
+    (tmp_path / "sections" / "section03.html").unlink()
+    (tmp_path / "sections" / "section03.csv").unlink()
+    progress: list[tuple[int, int]] = []
+    duo3.sentence.save(url, sections=[1, 2, 3], progress=lambda *p: progress.append(p))
+    assert Handler.sections == [3]
+    assert progress == [(2, 3), (3, 3)]
+    rows = list(duo3.sentence.load(str(tmp_path / "text.csv")))
+    assert [row[1] for row in rows] == list(range(1, 10))
+
+
+def test_save_empty(url, tmp_path, monkeypatch):
+    monkeypatch.setattr(duo3.sentence, "PATH", str(tmp_path / "text.csv"))
+    monkeypatch.setattr(duo3.sentence, "CACHE", str(tmp_path / "sections"))
+    with pytest.raises(ValueError):
+        duo3.sentence.save(url, sections=[1, 2, 3, EMPTY])
+    cache = duo3.sentence.Cache()
+    assert cache.is_valid(3)
+    assert cache.entry(EMPTY) is None
+    assert not (tmp_path / "sections" / "section05.html").exists()
+
+    cache.entry(3)["count"] = 0
+    assert not cache.is_valid(3)
+
+
+def test_session_closed(url, tmp_path, monkeypatch):
+    monkeypatch.setattr(duo3.sentence, "PATH", str(tmp_path / "text.csv"))
+    monkeypatch.setattr(duo3.sentence, "CACHE", str(tmp_path / "sections"))
+    sessions = []
+    connect = duo3.sentence.connect
+
+    def tracked(workers):
+        session = connect(workers)
+        sessions.append(session)
+        return session
+
+    monkeypatch.setattr(duo3.sentence, "connect", tracked)
+    closed = []
+    monkeypatch.setattr("requests.Session.close", lambda self: closed.append(self))
+    duo3.sentence.save(url, sections=[1, 2])
+    list(duo3.sentence.fetch(url, [1, 2]))
+    assert len(sessions) == 2
+    assert closed == sessions
+
+    with connect(2) as session:
+        duo3.sentence.save(url, session, sections=[1, 2, 3])
+        list(duo3.sentence.fetch(url, [1], session=session))
+        assert session not in closed
+    assert len(sessions) == 2
@@ -0,0 +1,73 @@
+import duo3.history
+from duo3.history import History, Record
+
+
+def test_record():
+    record = Record([3, 0, 9, 0, 0, 1, 0])
+    assert str(record) == "D3090010"
+    assert (record.count, record.correct, record.last) == (7, 4, 0)
+    assert record.errors == 2
+    assert Record.from_string("D3090010").errors == record.errors
+
+
+def test_history(tmp_path, monkeypatch):
+    monkeypatch.setattr(duo3.history, "PATH", str(tmp_path / "history.csv"))
+    history = History()
+    assert history.is_wrong(1)
+    history.append(1, 2)
+    history.append(1, 0)
+    assert not history.is_wrong(1)
+    assert history.get_by_list(1) == [2, 0]
+    history.save()
+    history = duo3.history.read()
+    assert history.get(1) == "D20"
+    assert history.record(1).count == 2
+
+
+def test_sqlite(tmp_path, monkeypatch):
+    monkeypatch.setattr(duo3.history, "PATH", str(tmp_path / "history.csv"))
+    monkeypatch.setattr(duo3.history, "DB_PATH", str(tmp_path / "history.db"))
+    (tmp_path / "history.csv").write_text("1,D30\n2,D1\n")
+    history = duo3.history.read("sqlite")
+    assert history.get(1) == "D30"
+    history.register([(1, 1), (2, 1), (3, 1), (4, 2)])
+    assert history.count_wrong(1, []) == 2
+    history.append(2, 0)
+    history.save()
+    assert history.count_wrong(1, []) == 1
+    assert history.count_wrong(2, []) == 1
+    history.storage.close()
+    history = duo3.history.read("sqlite")
+    assert history.get(2) == "D10"
+    history.storage.close()
+
+
+def test_writer(tmp_path, monkeypatch):
+    monkeypatch.setattr(duo3.history, "PATH", str(tmp_path / "history.csv"))
+    history = History()
+    writer = duo3.history.Writer(history)
+    for no in range(1, 101):
+        history.append(no, no % 3)
+        writer.schedule()
+    assert writer.flush(5)
+    assert 1 <= writer.writes <= 100
+    history.append(1, 0)
+    writer.schedule()
+    writer.close(5)
+    assert not writer.thread.is_alive()
+    assert duo3.history.read().get(1) == "D10"
+    assert [p.name for p in tmp_path.iterdir()] == ["history.csv"]
+
+
+def test_tracker():
+    history = History()
+    history.append(1, 0)
+    tracker = duo3.history.Tracker(history, [(1, 1), (2, 1), (3, 2)])
+    assert (tracker.count(1), tracker.count(2)) == (1, 1)
+    history.append(2, 0)
+    history.append(3, 2)
+    assert (tracker.count(1), tracker.count(2)) == (0, 1)
+    assert tracker.pop() == ({1, 2}, {2, 3})
+    history.append(1, 1)
+    assert tracker.count(1) == 1
+    assert tracker.pop() == ({1}, {1})
@@ -0,0 +1,140 @@
+import random
+import threading
+
+import duo3.scheduler
+from duo3.executor import Executor
+from duo3.history import History, Storage
+from duo3.scheduler import DAY, RELEARN, Item, Scheduler
+
+
+def test_item():
+    item = Item(1, 1)
+    item.review(0, 0)
+    assert item.due == DAY
+    item.review(1, DAY)
+    assert item.due == 7 * DAY
+    item.review(0, 0)
+    assert item.interval == 16
+    ease = item.ease
+    item.review(4, 100)
+    assert item.due == 100 + RELEARN
+    assert item.reps == 0
+    assert item.ease < ease
+
+
+def test_due():
+    sections = [(no, 1 + no // 10) for no in range(1, 100)]
+    scheduler = Scheduler(sections, "unused")
+    rng = random.Random(0)
+    for item in scheduler.items.values():
+        item.due = rng.randrange(1000)
+    scheduler.build()
+    expected = sorted(
+        (item.due, item.ease, no)
+        for no, item in scheduler.items.items()
+        if item.section in (2, 5, 7)
+    )
+    assert scheduler.due([2, 5, 7], 12) == [e[2] for e in expected[:12]]
+    assert scheduler.due([2, 5, 7], 100, now=500) == [
+        e[2] for e in expected if e[0] <= 500
+    ]
+
+
+def test_review(tmp_path):
+    path = str(tmp_path / "schedule.log")
+    history = History(storage=Storage())
+    history.append(1, 0)
+    history.append(2, 3)
+    scheduler = duo3.scheduler.read([(1, 1), (2, 1), (3, 1)], history, path)
+    assert scheduler.due([1], now=0) == [2, 3]
+    scheduler.review(2, 0, now=0)
+    scheduler.review(3, 0, now=10)
+    assert scheduler.due([1], 1) == [2]
+    assert scheduler.due([1]) == [2, 3, 1]
+    scheduler.close()
+
+    loaded = duo3.scheduler.read([(1, 1), (2, 1), (3, 1)], History(), path)
+    assert loaded.lines == 5
+    assert loaded.due([1]) == [2, 3, 1]
+    loaded.lines = 100
+    loaded.review(1, 5, now=0)
+    loaded.close()
+    with open(path) as file:
+        assert len(file.readlines()) == 3
+
+
+def test_torn(tmp_path):
+    path = tmp_path / "schedule.log"
+    sections = [(1, 1), (2, 1)]
+    path.write_text("1,100,1,2.600,1\nbad line\n2,200,6,2.5")
+    scheduler = duo3.scheduler.read(sections, History(), str(path))
+    assert scheduler.torn
+    assert scheduler.items[1].due == 100
+    assert scheduler.items[2].due == 0
+    scheduler.review(2, 0, now=0)
+    scheduler.close()
+    loaded = duo3.scheduler.read(sections, History(), str(path))
+    assert not loaded.torn
+    assert loaded.items[2].due == DAY
+
+
+def test_executor(tmp_path):
+    path = str(tmp_path / "schedule.log")
+    executor = Executor()
+    sections = [(no, 1) for no in range(1, 11)]
+    scheduler = duo3.scheduler.read(sections, History(), path, executor)
+    for k in range(100):
+        scheduler.review(1 + k % 10, k % 3, now=k)
+    scheduler.close()
+    executor.shutdown()
+    assert executor.stats()["tasks"]["schedule.save"]["duration"]["count"] >= 1
+    loaded = duo3.scheduler.read(sections, History(), path)
+    assert [loaded.items[no].dumps() for no in range(1, 11)] == [
+        scheduler.items[no].dumps() for no in range(1, 11)
+    ]
+
+
+def test_cancelled(tmp_path):
+    path = str(tmp_path / "schedule.log")
+    executor = Executor(workers=1)
+    scheduler = duo3.scheduler.read([(1, 1), (2, 1)], History(), path, executor)
+    gate = threading.Event()
+    executor.submit(gate.wait, name="gate")
+    scheduler.review(1, 0, now=0)
+    assert scheduler.task and scheduler.task.cancel()
+    scheduler.review(2, 0, now=0)
+    gate.set()
+    assert executor.join(5)
+    assert executor.stats()["tasks"]["schedule.save"]["duration"]["count"] == 1
+    loaded = duo3.scheduler.read([(1, 1), (2, 1)], History(), path)
+    assert loaded.items[1].due == loaded.items[2].due == DAY
+    executor.shutdown()
+
+
+def test_close_queued(tmp_path):
+    path = str(tmp_path / "schedule.log")
+    executor = Executor(workers=1)
+    scheduler = duo3.scheduler.read([(1, 1)], History(), path, executor)
+    gate = threading.Event()
+    executor.submit(gate.wait, name="gate")
+    scheduler.review(1, 0, now=0)
+    task = scheduler.task
+    scheduler.close(0.01)
+    assert task and task.state == "cancelled"
+    assert duo3.scheduler.read([(1, 1)], History(), path).items[1].due == DAY
+    gate.set()
+    executor.shutdown()
+
+
+def test_derive():
+    history = History(storage=Storage())
+    for no in range(1, 101):
+        for deduction in [0, 0, 0]:
+            history.append(no, deduction)
+    scheduler = Scheduler([(no, 1) for no in range(1, 101)], "unused")
+    scheduler.derive(history, now=0)
+    interval = scheduler.items[1].interval * DAY
+    dues = sorted(item.due for item in scheduler.items.values())
+    assert 0 < dues[0] and dues[-1] <= interval
+    days = {int(due // DAY) for due in dues}
+    assert len(days) == interval // DAY
@@ -0,0 +1,83 @@
+import csv
+import os
+import time
+
+import pytest
+
+import duo3.corpus
+import duo3.search
+from duo3.search import Index
+from duo3.sentence import Sentence, Sentences
+
+ROWS = [
+    (1, 1, "The cat sat on the mat.", "猫がマットの上に座った。"),
+    (1, 2, "I can't find my cat.", "猫が見つからない。"),
+    (2, 3, "The category is empty.", "その分類は空だ。"),
+    (2, 4, "Sat on a hat, the cat did.", "猫は帽子の上に座った。"),
+    (3, 5, "A café in Paris.", "パリのカフェ。"),
+]
+
+
+def index() -> Index:
+    return Index.build(Sentences([Sentence(*row) for row in ROWS]))
+
+
+def test_search():
+    idx = index()
+    assert idx.search("cat") == [1, 2, 4]
+    assert idx.search("CAT.") == [1, 2, 4]
+    assert idx.search("cat*") == [1, 2, 3, 4]
+    assert idx.search("can't") == [2]
+    assert idx.search('"the cat"') == [1, 4]
+    assert idx.search('"cat sat"') == [1]
+    assert idx.search("sat cat") == [1, 4]
+    assert idx.search("dog") == []
+    assert idx.search("") == []
+    assert idx.search("猫") == [1, 2, 4]
+    assert idx.search("上に座った") == [1, 4]
+    assert idx.search("マット") == [1]
+    assert idx.search("猫 hat") == [4]
+    assert [s.english for s in idx.select("mat")] == [ROWS[0][2]]
+    assert idx.search("café") == [5]
+    assert idx.search("Café.") == [5]
+    assert idx.search("caf*") == [5]
+    assert idx.search("カフェ") == [5]
+
+
+def test_prefix_words():
+    idx = index()
+    assert "the cat" in idx.terms and "猫" in idx.terms
+    assert all(" " not in word and word.islower() for word in idx.words)
+    assert "猫" not in idx.words
+    assert idx.prefix("the") == {0, 2, 3}
+    assert idx.prefix("") == set(range(len(ROWS)))
+
+
+def test_read(tmp_path):
+    source = str(tmp_path / "text.csv")
+    with open(source, "w", encoding="utf8") as file:
+        csv.writer(file, lineterminator="\n").writerows(ROWS)
+    sentences = duo3.corpus.read(source)
+    built = duo3.search.read(sentences)
+    assert os.path.exists(tmp_path / "text.idx")
+    loaded = duo3.search.read(sentences)
+    assert loaded.terms == built.terms
+    assert loaded.postings == built.postings
+    assert loaded.words == built.words
+    assert loaded.search('"the cat" 座') == [1, 4]
+    sentences.close()
+
+
+@pytest.mark.benchmark
+def test_speed(sentences):
+    idx = duo3.search.read(sentences)
+    english = sentences[0].english.split()[0]
+    phrase = " ".join(duo3.search.words(sentences[1].english)[:3])
+    queries = [english, english[:2] + "*", f'"{phrase}"']
+    queries.append(sentences[2].japanese[:4])
+    for query in queries:
+        assert idx.search(query)
+        start = time.perf_counter()
+        for _ in range(100):
+            idx.search(query)
+        assert (time.perf_counter() - start) / 100 < 1e-3, query
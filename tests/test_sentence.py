@@ -1,4 +1,9 @@
-from duo3.sentence import Sentences
+import time
+from dataclasses import FrozenInstanceError
+
+import pytest
+
+from duo3.sentence import Attempt, Sentence, Sentences
 
 
 def test_sentences(sentences: Sentences):
@@ -16,3 +21,77 @@ def test_sample(sentences: Sentences):
         assert 22 <= s.no <= 35
     x = sentences.sample(3, 0)
     assert len(x) == 14
+
+
+def test_index(sentences: Sentences):
+    assert sentences.sections == list(range(1, 46))
+    assert sentences.get(22).section == 3
+    assert len(sentences.no_array) == len(sentences.section_array) == 560
+
+
+def test_sorted_copy():
+    rows = [Sentence(2, 3, "Hi.", "やあ。"), Sentence(1, 1, "Go.", "行け。")]
+    sentences = Sentences(rows)
+    assert [s.no for s in sentences] == [1, 3]
+    assert [s.no for s in rows] == [3, 1]
+    assert sentences.sections == [1, 2]
+
+
+def test_select(sentences: Sentences):
+    x = sentences.select([1, 3], lambda no: no % 2 == 0)
+    assert [s.no for s in x] == [2, 4, 6, 8, 22, 24, 26, 28, 30, 32, 34]
+    x = sentences.sample([1, 3], 3, predicate=lambda no: no % 2 == 0)
+    assert len(x) == 3
+
+
+def test_attempt():
+    sentence = Sentence(1, 1, "I'm OK.", "大丈夫。")
+    assert list(sentence.positions) == [0, 2, 4, 5]
+    with pytest.raises(FrozenInstanceError):
+        sentence.no = 2  # type: ignore
+    attempt = Attempt(sentence)
+    assert attempt.prompt() == "_"
+    assert attempt.input("i")
+    assert attempt.prompt() == "I'_"
+    assert not attempt.input("x")
+    assert not attempt.input("x")
+    assert attempt.deduction == 2
+    assert attempt.input("m")
+    assert attempt.input("tab")
+    assert attempt.input("k")
+    assert attempt.is_finished()
+    assert attempt.prompt() == "I'm OK."
+    assert attempt.deduction == 5
+    assert attempt.mistakes == [(2, "x"), (2, "x"), (4, "tab")]
+
+
+def test_delta():
+    attempt = Attempt(Sentence(1, 1, "\"Hi,\" he said.", ""))
+    assert attempt.delta() == "\""
+    for key in "hi":
+        attempt.input(key)
+    assert attempt.delta() == "Hi,\" "
+    assert attempt.delta() == ""
+    for key in "hesaid":
+        attempt.input(key)
+    assert attempt.delta() == "he said."
+
+
+@pytest.mark.benchmark
+def test_input_cost():
+    def cost(n: int) -> float:
+        english = ("abc, " * n)[:n]
+        keys = [c for c in english if c.isalpha()]
+        best = float("inf")
+        for _ in range(5):
+            attempt = Attempt(Sentence(1, 1, english, ""))
+            start = time.perf_counter()
+            for key in keys:
+                attempt.input(key)
+                attempt.deduction
+                attempt.delta()
+            best = min(best, (time.perf_counter() - start) / len(keys))
+        return best
+
+    costs = [cost(n) for n in [20, 200, 2000]]
+    assert max(costs) < 3 * min(costs), costs
@@ -0,0 +1,112 @@
+import asyncio
+import time
+
+import pytest
+
+import duo3.history
+import duo3.server
+from duo3.history import CsvStorage
+from duo3.server import Server, load, request
+
+
+def test_protocol(corpus, tmp_path):
+    async def run():
+        server = Server(corpus, str(tmp_path), interval=0.01)
+        port = await server.start(port=0)
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b"key a\n")
+        assert b"Log in first" in await reader.readline()
+        assert await request(reader, writer, "user alice") == [
+            {"type": "user", "name": "alice"}
+        ]
+        (start,) = await request(reader, writer, "drill 3")
+        assert start["no"] == 3
+        assert start["japanese"] == "やあ。"
+        assert [e["type"] for e in await request(reader, writer, "key x")] == [
+            "ng",
+            "render",
+        ]
+        await request(reader, writer, "key x")
+        await request(reader, writer, "key h")
+        (render,) = await request(reader, writer, "key i")
+        assert render["prompt"] == "Hi."
+        assert render["deduction"] == 1
+        assert render["finished"]
+        await asyncio.sleep(0.05)
+        assert server.saves == 1
+        (finish,) = await request(reader, writer, "key n")
+        assert (finish["count"], finish["deduction"]) == (1, 1)
+        assert not finish["aborted"]
+        writer.write(b"quit\n")
+        await writer.drain()
+        assert await reader.readline() == b""
+        writer.close()
+        await server.close()
+        return server
+
+    server = asyncio.run(run())
+    assert server.keys == 5
+    records = duo3.history.load(str(tmp_path / "alice" / "history.csv"))
+    assert str(records[3]) == "D1"
+
+
+def test_load(corpus, tmp_path):
+    result = asyncio.run(load(None, 0, 20, 2, 0.1, corpus, str(tmp_path)))
+    assert result["users"] == 20
+    assert result["keys"] > 20 * 2 * 2
+    assert result["p99_us"] >= result["p50_us"]
+    assert len(list(tmp_path.iterdir())) == 20
+    for user in tmp_path.iterdir():
+        assert duo3.history.load(str(user / "history.csv"))
+
+
+def test_close_waits_for_save(corpus, tmp_path, monkeypatch):
+    events: list[str] = []
+    original = CsvStorage.save
+
+    def save(self, history):
+        events.append("start")
+        time.sleep(0.05 if len(events) == 1 else 0)
+        original(self, history)
+        events.append("end")
+
+    monkeypatch.setattr(CsvStorage, "save", save)
+
+    async def run():
+        server = Server(corpus, str(tmp_path), interval=0.01)
+        await server.start(port=0)
+        user = server.user("bob")
+        user.history.append(1, 0)
+        user.dirty = True
+        await asyncio.sleep(0.03)
+        user.history.append(2, 0)
+        user.dirty = True
+        await server.close()
+
+    asyncio.run(run())
+    assert events == ["start", "end", "start", "end"]
+    records = duo3.history.load(str(tmp_path / "bob" / "history.csv"))
+    assert sorted(records) == [1, 2]
+
+
+def test_load_temporary(corpus, tmp_path, monkeypatch):
+    monkeypatch.setattr(duo3.server, "USERS", str(tmp_path / "users"))
+    result = asyncio.run(load(None, 0, 2, 1, 0.1, corpus))
+    assert result["users"] == 2
+    assert not (tmp_path / "users").exists()
+
+    closed = []
+    close = Server.close
+
+    async def tracked(self):
+        closed.append(self)
+        await close(self)
+
+    async def fail(*args):
+        raise ConnectionResetError
+
+    monkeypatch.setattr(Server, "close", tracked)
+    monkeypatch.setattr(duo3.server, "drill", fail)
+    with pytest.raises(ConnectionResetError):
+        asyncio.run(load(None, 0, 2, 1, 0.1, corpus))
+    assert len(closed) == 1
@@ -0,0 +1,81 @@
+from duo3.history import History, Storage
+from duo3.scheduler import Scheduler
+from duo3.search import Index
+from duo3.session import DrillSession, Recorder, replay, summary
+
+
+def drill(session: DrillSession):
+    session.start([session.sentences.get(1), session.sentences.get(2)])
+    for key in "gx":
+        session.key(key)
+    session.key("o")
+    session.key("spacebar")
+    session.key("n")
+    session.key("tab")
+    session.key("o")
+    session.key("n")
+
+
+def test_session(corpus):
+    session = DrillSession(corpus, History(storage=Storage()))
+    events: list[str] = []
+    for name in ["start", "render", "ng", "play", "persist", "finish"]:
+        session.bind(**{name: lambda *args, name=name: events.append(name)})
+    drill(session)
+    assert events.count("start") == 2
+    assert events.count("ng") == 2
+    assert events.count("persist") == 2
+    assert events[-1] == "finish"
+    assert session.history.get(1) == "D0"
+    assert session.history.get(2) == "D4"
+    assert session.problems == []
+
+
+def test_begin(corpus):
+    history = History(storage=Storage())
+    history.append(1, 0)
+    session = DrillSession(corpus, history)
+    session.begin(1)
+    assert [p.no for p in session.problems] == [2]
+    history.append(2, 0)
+    session.begin([1])
+    assert sorted(p.no for p in session.problems) == [1, 2]
+
+
+def test_replay(corpus, tmp_path):
+    path = str(tmp_path / "session.rec")
+    session = DrillSession(corpus, History(storage=Storage()))
+    recorder = Recorder(session, path)
+    drill(session)
+    recorder.close()
+
+    session = DrillSession(corpus, History(storage=Storage()))
+    latencies = replay(path, session)
+    assert len(latencies) == 8
+    assert summary(latencies)["keys"] == 8
+    assert session.history.get(1) == "D0"
+    assert session.history.get(2) == "D4"
+
+
+def test_schedule(corpus, tmp_path):
+    history = History(storage=Storage())
+    columns = [(1, 1), (2, 1), (3, 2)]
+    scheduler = Scheduler(columns, str(tmp_path / "schedule.log"))
+    scheduler.build()
+    session = DrillSession(corpus, history, scheduler)
+    session.begin([1, 2], scheduled=True)
+    assert [p.no for p in session.problems] == [1, 2, 3]
+    session.key("g")
+    session.key("o")
+    session.key(".")
+    scheduler.close()
+    assert scheduler.items[1].reps == 1
+    assert scheduler.due([1, 2], now=1) == [2, 3]
+
+
+def test_search(corpus):
+    session = DrillSession(corpus, History(storage=Storage()))
+    session.start(Index.build(session.sentences).select("no go"))
+    assert session.problems == []
+    session.start(Index.build(session.sentences).select("だめ"))
+    assert [p.no for p in session.problems] == [2]
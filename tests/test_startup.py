@@ -0,0 +1,37 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+BUDGET = {
+    "duo3.sentence": 0.15,
+    "duo3.history": 0.15,
+    "duo3.trace": 0.15,
+    "duo3.console": 0.15,
+    "duo3.executor": 0.15,
+}
+
+
+def importtime(module: str, home: str) -> dict[str, float]:
+    env = dict(os.environ, HOME=home, USERPROFILE=home)
+    args = [sys.executable, "-X", "importtime", "-c", f"import {module}"]
+    stderr = subprocess.run(args, env=env, capture_output=True, text=True).stderr
+    times = {}
+    for line in stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cumulative, name = line[12:].split("|")
+            if cumulative.strip().isdigit():
+                times[name.strip()] = int(cumulative) / 1e6
+    return times
+
+
+@pytest.mark.parametrize("module", list(BUDGET))
+def test_importtime(module: str, tmp_path):
+    times = importtime(module, str(tmp_path))
+    report = sorted(times.items(), key=lambda x: -x[1])[:10]
+    report_text = "\n".join(f"{t * 1000:8.1f} ms  {name}" for name, t in report)
+    assert times[module] < BUDGET[module], report_text
+    for name in ["bs4", "requests", "kivy"]:
+        assert name not in times
+    assert not (tmp_path / ".duo3").exists()
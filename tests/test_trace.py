@@ -0,0 +1,55 @@
+import json
+
+import duo3.trace
+from duo3.trace import Histogram, Tracer
+
+
+def test_histogram():
+    histogram = Histogram()
+    for us in range(1, 1001):
+        histogram.add(us)
+    assert histogram.count == 1000
+    assert histogram.max == 1000
+    assert 450 < histogram.percentile(0.5) < 600
+    assert 950 < histogram.percentile(0.99) <= 1000
+
+
+def test_disabled(monkeypatch):
+    monkeypatch.delenv("DUO3_TRACE", raising=False)
+    monkeypatch.setattr(duo3.trace, "tracer", None)
+    assert duo3.trace.span("x") is duo3.trace.NULL
+    duo3.trace.mark("key")
+    duo3.trace.since("key", "x")
+
+    @duo3.trace.timed("f")
+    def f(x):
+        return x + 1
+
+    assert f(1) == 2
+
+
+def test_tracer(tmp_path, monkeypatch):
+    tracer = Tracer()
+    monkeypatch.setattr(duo3.trace, "tracer", tracer)
+
+    @duo3.trace.timed("f")
+    def f():
+        with duo3.trace.span("g"):
+            pass
+
+    for _ in range(3):
+        f()
+    duo3.trace.mark("key")
+    duo3.trace.since("key", "key-to-render")
+    duo3.trace.since("key", "key-to-render")
+    summary = tracer.summary()["spans"]
+    assert summary["f"]["count"] == 3
+    assert summary["g"]["count"] == 3
+    assert summary["key-to-render"]["count"] == 1
+
+    trace, path = tmp_path / "trace.json", tmp_path / "summary.json"
+    tracer.export(str(trace), str(path))
+    events = json.loads(trace.read_text())["traceEvents"]
+    assert len(events) == 7
+    assert {e["ph"] for e in events} == {"X"}
+    assert json.loads(path.read_text())["spans"]["f"]["count"] == 3
@@ -0,0 +1,148 @@
+from kivy.uix.recycleboxlayout import RecycleBoxLayout
+
+from duo3.uix import (
+    PrerenderedLabel,
+    SectionSelector,
+    Selector,
+    SentenceSelector,
+    TextureCache,
+    Updates,
+)
+
+
+class Texture:
+    size = (10, 20)
+
+
+class Widget:
+    def __init__(self):
+        self.sets: list[tuple[str, object]] = []
+
+    def __setattr__(self, name, value):
+        if name != "sets":
+            self.sets.append((name, value))
+        super().__setattr__(name, value)
+
+
+def test_texture_cache():
+    cache = TextureCache(2)
+    a, b, c = Texture(), Texture(), Texture()
+    cache.put(("a",), a)
+    cache.put(("b",), b)
+    assert cache.get(("a",)) is a
+    cache.put(("c",), c)
+    assert ("a",) in cache and ("c",) in cache
+    assert ("b",) not in cache
+    assert cache.get(("b",)) is None
+
+
+def test_prerendered_label():
+    label = PrerenderedLabel(text="Section 1", font_size=20)
+    key = label.key("Section 2")
+    assert key == label.key("Section 2")
+    assert key != label.key("Section 3")
+    label.bold = True
+    assert key != label.key("Section 2")
+    label.text_size = (100, None)
+    key = label.key("Section 2")
+    texture = Texture()
+    label.cache.put(key, texture)
+    label.text = "Section 2"
+    label.texture_update()
+    assert label.texture is texture
+    assert label.texture_size == [10, 20]
+
+
+def test_updates():
+    scheduled = []
+    updates = Updates(lambda: scheduled.append(1))
+    label, bar = Widget(), Widget()
+    updates.set(label, text="a", color="EEEEEE")
+    updates.set(label, text="b")
+    updates.set(bar, value=None)
+    assert len(scheduled) == 3
+    assert label.sets == []
+    assert updates.apply() == 3
+    assert label.sets == [("text", "b"), ("color", "EEEEEE")]
+    assert bar.sets == [("value", None)]
+    updates.set(label, text="b", color="33FF77")
+    assert updates.apply() == 1
+    assert label.sets[-1] == ("color", "33FF77")
+    updates.set(bar, value=None)
+    assert updates.apply() == 0
+    assert updates.apply() == 0
+    assert len(bar.sets) == 1
+
+
+def states(selector: Selector) -> dict[int, str]:
+    return {row["value"]: row["state"] for row in selector.data}
+
+
+def test_selector():
+    selector = Selector(RecycleBoxLayout())
+    selector.set_items([3, 1, 2], ["DD3333", "EEEEEE", "33FF77"])
+    assert selector.values == [3, 1, 2]
+    assert [row["text"] for row in selector.data] == ["3", "1", "2"]
+    assert [row["color"] for row in selector.data] == ["DD3333", "EEEEEE", "33FF77"]
+    assert selector.selected is None
+    assert set(states(selector).values()) == {"normal"}
+
+    selector.toggle(1)
+    assert selector.selected == 1
+    assert states(selector) == {3: "normal", 1: "down", 2: "normal"}
+    selector.toggle(2)
+    assert states(selector) == {3: "normal", 1: "normal", 2: "down"}
+    selector.toggle(2)
+    assert selector.selected is None
+    assert set(states(selector).values()) == {"normal"}
+
+    selector.toggle(3)
+    selector.set_colors({3: "33FF77", 9: "DD3333"})
+    assert selector.data[0] == {
+        "value": 3,
+        "text": "3",
+        "color": "33FF77",
+        "state": "down",
+    }
+    selector.set_items([3, 4])
+    assert selector.selected == 3
+    assert states(selector) == {3: "down", 4: "normal"}
+    assert [row["color"] for row in selector.data] == ["EEEEEE", "EEEEEE"]
+    selector.set_items([4, 5])
+    assert selector.selected is None
+    assert states(selector) == {4: "normal", 5: "normal"}
+    selector.toggle(5)
+    assert states(selector) == {4: "normal", 5: "down"}
+
+
+def test_section_selector():
+    selector = SectionSelector()
+    selected = []
+    selector.bind(selected=lambda instance, value: selected.append(value))
+    selector.set_sections([1, 2, 3])
+    assert selector.sections == []
+    selector.random([2])
+    assert selector.sections == [2]
+    assert states(selector.selector) == {1: "normal", 2: "down", 3: "normal"}
+    selector.random()
+    assert selector.sections[0] in (1, 2, 3)
+    selector.clear()
+    assert selector.sections == []
+    assert selected[-1] is None
+    assert set(states(selector.selector).values()) == {"normal"}
+
+
+def test_sentence_selector():
+    selector = SentenceSelector()
+    selector.set_sentence_numbers(list(range(1, 31)), ["EEEEEE"] * 30)
+    assert len(selector) == 30
+    selector.selector.toggle(20)
+    assert selector.selected == 20
+    selector.unselect()
+    assert selector.selected is None
+    selector.selector.toggle(20)
+    selector.set_sentence_numbers([20, 21], ["EEEEEE", "33FF77"])
+    assert selector.selected is None
+    assert states(selector.selector) == {20: "normal", 21: "normal"}
+    selector.clear()
+    assert len(selector) == 0